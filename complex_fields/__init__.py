@@ -0,0 +1 @@
+default_app_config = 'complex_fields.apps.ComplexFieldsConfig'
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ComplexFieldsConfig(AppConfig):
+    name = 'complex_fields'
+    # The type of the ids of the migrations, whatever DEFAULT_AUTO_FIELD
+    # the project sets.
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        # Connect the signal receivers keeping the caches and the
+        # snapshots in sync.
+        import complex_fields.cache
+        import complex_fields.snapshots
@@ -1,12 +1,181 @@
 import django.dispatch
+import reversion
+from django.db import close_old_connections, transaction
 from django.utils.translation import get_language
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
 
 from source.models import Source
 
+from complex_fields.models import (FieldValidationError, ForeignKeyResolver,
+                                   bulk_create_rows,
+                                   complex_fields_bulk_updated,
+                                   fallback_to_any_language,
+                                   get_accesspoint_ids, get_field_validator,
+                                   get_language_chain, record_versions,
+                                   set_field_sources)
+
 object_ref_saved = django.dispatch.Signal(providing_args=["object_id"])
 
 
+def get_saved_object_ids(model, object_id):
+    # The primary keys of the objects object_ref_saved was sent for, it
+    # sends the uuid of the objects that have one.
+    try:
+        model._meta.get_field('uuid')
+    except FieldDoesNotExist:
+        return [object_id]
+
+    return model._default_manager.filter(uuid=object_id).values_list('pk', flat=True)
+
+
+PREFETCH_BATCH_SIZE = 500
+
+
+def prefetch_complex_fields(objects, fields=None, lang=None):
+    # Load the complex field and list rows of many objects with one IN
+    # query per field model (per batch of PREFETCH_BATCH_SIZE objects) and
+    # attach them to each object, so its containers answer without
+    # querying. fields restricts the prefetch to the given field models or
+    # field string ids. When lang is given and the deployment does not fall
+    # back to any language, translated fields only load the rows of the
+    # language chain of lang.
+    objects = list(objects)
+    if not objects:
+        return objects
+
+    for container, is_list in get_prefetch_containers(objects, fields):
+        load_prefetched_rows(objects, container, is_list, lang)
+
+    return objects
+
+
+async def aprefetch_complex_fields(objects, fields=None, lang=None):
+    # prefetch_complex_fields running the queries of the field models
+    # concurrently, each in its own thread and database connection. The
+    # queries don't see the writes of a transaction in progress.
+    import asyncio
+    from asgiref.sync import sync_to_async
+
+    objects = await sync_to_async(list)(objects)
+    if not objects:
+        return objects
+
+    def load(container, is_list):
+        try:
+            load_prefetched_rows(objects, container, is_list, lang)
+        finally:
+            close_old_connections()
+
+    await asyncio.gather(*[
+        sync_to_async(load, thread_sensitive=False)(container, is_list)
+        for container, is_list in get_prefetch_containers(objects, fields)
+    ])
+
+    return objects
+
+
+def get_prefetch_containers(objects, fields=None):
+    containers = []
+    for container in objects[0].complex_fields:
+        containers.append((container, False))
+    for container in objects[0].complex_lists:
+        containers.append((container, True))
+
+    if fields is not None:
+        fields = set(fields)
+        containers = [
+            (container, is_list) for container, is_list in containers
+            if (container.field_model in fields or
+                container.get_field_str_id() in fields)
+        ]
+
+    for object_ in objects:
+        if getattr(object_, '_complex_field_rows', None) is None:
+            object_._complex_field_rows = {}
+
+    return containers
+
+
+def load_prefetched_rows(objects, container, is_list, lang=None):
+    objects_by_id = {object_.id: object_ for object_ in objects
+                     if object_.id is not None}
+    object_ids = list(objects_by_id)
+    field_model = container.field_model
+
+    c_fields = field_model.objects.all()
+    if is_list:
+        c_fields = c_fields.order_by('value', 'pk')
+        key = (field_model, None)
+    elif (lang is not None and container.translated and
+          not fallback_to_any_language()):
+        c_fields = c_fields.filter(lang__in=get_language_chain(lang))
+        key = (field_model, lang)
+    else:
+        key = (field_model, None)
+
+    rows_by_object = {object_id: [] for object_id in object_ids}
+    for start in range(0, len(object_ids), PREFETCH_BATCH_SIZE):
+        batch = object_ids[start:start + PREFETCH_BATCH_SIZE]
+        for row in c_fields.filter(object_ref_id__in=batch):
+            row.object_ref = objects_by_id[row.object_ref_id]
+            rows_by_object[row.object_ref_id].append(row)
+
+    for object_ in objects:
+        object_._complex_field_rows[key] = rows_by_object.get(object_.id, [])
+
+
+class ModelValidator(object):
+    # The validators of the complex fields of a BaseModel subclass, with
+    # whether each is required, computed once per class.
+    def __init__(self, model):
+        object_ = model()
+        self.fields = [
+            (field.get_field_str_id(),
+             get_field_validator(field.field_model),
+             field.get_field_str_id() in object_.required_fields)
+            for field in object_.complex_fields
+        ]
+
+    def collect_foreign_keys(self, dict_values, resolver):
+        for field_name, validator, required in self.fields:
+            fk_model = validator.descriptor.fk_model
+            if fk_model is not None and field_name in dict_values:
+                resolver.add(fk_model, dict_values[field_name]['value'])
+
+    def validate(self, dict_values, lang, resolver):
+        errors = {}
+        for field_name, validator, required in self.fields:
+            if ((field_name not in dict_values or
+                 dict_values[field_name]['value'] == "") and required):
+                errors[field_name] = FieldValidationError('required', "This field is required")
+            elif field_name in dict_values:
+                sources = {
+                    'sources': dict_values[field_name].get('sources', []),
+                    'confidence': dict_values[field_name].get('confidence', 0),
+                }
+                (error, value) = validator.validate(
+                    dict_values[field_name]['value'], sources, resolver=resolver
+                )
+
+                dict_values[field_name]['value'] = value
+                if error is not None:
+                    errors[field_name] = error
+
+        return (errors, dict_values)
+
+
+model_validators = {}
+
+
+def get_model_validator(model):
+    try:
+        return model_validators[model]
+    except KeyError:
+        validator = ModelValidator(model)
+        model_validators[model] = validator
+        return validator
+
+
 class SourceRequiredException(Exception):
     def __init__(self, message):
         super().__init__(message)
@@ -39,30 +208,47 @@ class BaseModel(object):
         except cls.DoesNotExist:
             return None
 
-    def validate(self, dict_values, lang=get_language()):
-        errors = {}
-        for field in self.complex_fields:
-            field_name = field.get_field_str_id()
+    def prefetch_complex_fields(self, fields=None, lang=None):
+        prefetch_complex_fields([self], fields=fields, lang=lang)
+        return self
 
-            if ((field_name not in dict_values or
-                 dict_values[field_name]['value'] == "") and
-                field_name in self.required_fields):
-                errors[field_name] = "This field is required"
-            elif field_name in dict_values:
-                sources = {
-                    'sources': dict_values[field_name].get('sources', []),
-                    'confidence': dict_values[field_name].get('confidence', 0),
-                }
-                (error, value) = field.validate(
-                    dict_values[field_name]['value'], lang, sources
-                )
+    async def aprefetch_complex_fields(self, fields=None, lang=None):
+        await aprefetch_complex_fields([self], fields=fields, lang=lang)
+        return self
 
-                dict_values[field_name]['value'] = value
-                if error is not None:
-                    errors[field_name] = error
+    def clear_prefetched_complex_fields(self):
+        self._complex_field_rows = None
 
+    def validate(self, dict_values, lang=get_language(), resolver=None):
+        validator = get_model_validator(self.__class__)
+        if resolver is None:
+            resolver = ForeignKeyResolver()
+            validator.collect_foreign_keys(dict_values, resolver)
+
+        (errors, dict_values) = validator.validate(dict_values, lang, resolver)
+        errors = {field_name: error.message for field_name, error in errors.items()}
         return (errors, dict_values)
 
+    @classmethod
+    def validate_batch(cls, batch, lang=get_language(), resolver=None):
+        # Validate many dict_values, looking up the ForeignKey values of all
+        # of them with one query per model. Returns an (errors, dict_values)
+        # pair per dict_values, errors mapping field ids to FieldValidationError.
+        validator = get_model_validator(cls)
+        if resolver is None:
+            resolver = ForeignKeyResolver()
+
+        for dict_values in batch:
+            validator.collect_foreign_keys(dict_values, resolver)
+
+        return [validator.validate(dict_values, lang, resolver)
+                for dict_values in batch]
+
+    def collect_foreign_keys(self, dict_values, resolver):
+        # Register the values of ForeignKey fields with resolver so a batch
+        # of validations looks them up together.
+        get_model_validator(self.__class__).collect_foreign_keys(dict_values, resolver)
+
     def update_list(self, complex_list, dict_values, lang):
 
         # Implies a new format for lists of complex fields
@@ -77,53 +263,103 @@ class BaseModel(object):
 
         field_model = complex_list.field_model
         field_key = complex_list.get_field_str_id()
+        table_object = complex_list.table_object
+        source_required = complex_list.descriptor.source_required
+        # Versions are only recorded on save, so rows of versioned lists
+        # are saved one by one while a revision is active.
+        save_rows = complex_list.descriptor.versioned and reversion.is_active()
+
+        complex_list.forget_prefetched_rows()
+
+        # If update values is empty, that means the user cleared out the
+        # field so everything is deleted.
+        update_values = {}
+        for field in dict_values[field_key]['values']:
+            if field.pk is None:
+                raise ValueError('The values of {} must be saved rows'.format(field_key))
+            update_values.setdefault(field.pk, field)
+
+        kept_values = [field for field in update_values.values()
+                       if field.object_ref_id == table_object.id]
+        new_values = [field for field in update_values.values()
+                      if field.object_ref_id != table_object.id]
+
+        current_values = field_model.objects.filter(object_ref=table_object)
+        current_values.exclude(pk__in=[field.pk for field in kept_values]).delete()
+        current_values = {field.pk: field for field in current_values}
+
+        if source_required:
+            accesspoints = list(dict_values[field_key]['sources'])
+            confidence = dict_values[field_key]['confidence']
+
+        # Only write the kept rows whose columns or sources changed.
+        changed_values = []
+        for field in kept_values:
+            if source_required:
+                field.confidence = confidence
+            current = current_values.get(field.pk)
+            if current is None or field.get_changed_fields(current._loaded_values):
+                changed_values.append(field)
+
+        resourced_ids = []
+        if source_required and kept_values:
+            accesspoint_ids = set(accesspoint.pk for accesspoint in accesspoints)
+            saved_accesspoint_ids = get_accesspoint_ids(
+                field_model, [field.pk for field in kept_values]
+            )
+            for field in kept_values:
+                current = current_values.get(field.pk, field)
+                if (saved_accesspoint_ids.get(field.pk, set()) != accesspoint_ids or
+                        str(current.confidence) != str(confidence)):
+                    resourced_ids.append(field.pk)
+
+        # The sources are written before the rows are saved, so the
+        # versions recorded on save hold them.
+        if resourced_ids:
+            set_field_sources(field_model, resourced_ids, accesspoints)
+
+        for field in changed_values:
+            field.save()
+
+        if resourced_ids and save_rows:
+            saved_ids = set(field.pk for field in changed_values)
+            for field in kept_values:
+                if field.pk in resourced_ids and field.pk not in saved_ids:
+                    current = current_values.get(field.pk, field)
+                    current.confidence = confidence
+                    current.save()
+        elif resourced_ids:
+            field_model.objects.filter(pk__in=resourced_ids).update(confidence=confidence)
+
+        # Values coming from another object are copied to this one.
+        new_objects = [
+            field_model(value=field.value, object_ref=table_object, lang=field.lang)
+            for field in new_values
+        ]
+        if source_required:
+            for new_object in new_objects:
+                new_object.confidence = confidence
+
+        if save_rows:
+            for new_object in new_objects:
+                new_object.save()
+        else:
+            new_objects = bulk_create_rows(field_model, new_objects)
 
-        update_values = set(dict_values[field_key]['values'])
-        current_values = set(field_model.objects.filter(object_ref=self))
-
-        if update_values:
-            removed_values = current_values - update_values
-
-            for field in removed_values:
-                field.delete()
-
-            for field in update_values:
-                if field.object_ref.id == complex_list.table_object.id:
-                    field.save()
-
-                    if getattr(field, 'source_required', False):
-                        accesspoints = dict_values[field_key]['sources']
-                        field.accesspoints.set(accesspoints, clear=True)
-
-                        for accesspoint in accesspoints:
-                            field.sources.add(accesspoint.source)
-
-                        field.confidence = dict_values[field_key]['confidence']
-                        field.save()
-                else:
-                    new_object = field_model.objects.create(value=field.value,
-                                                            object_ref=complex_list.table_object,
-                                                            lang=field.lang)
-
-                    if getattr(field, 'source_required', False):
-
-                        accesspoints = dict_values[field_key]['sources']
-                        new_object.accesspoints.set(accesspoints, clear=True)
-
-                        for accesspoint in accesspoints:
-                            new_object.sources.add(accesspoint.source)
-
-                        new_object.confidence = dict_values[field_key]['confidence']
-                        new_object.save()
+        if source_required and new_objects:
+            set_field_sources(field_model, [new_object.pk for new_object in new_objects],
+                              accesspoints)
+            record_versions(field_model, new_objects)
 
-        else:
-            # If update values is empty, that means the user cleared out the
-            # field so delete everything.
-            for field in current_values:
-                field.delete()
+        if resourced_ids or new_objects:
+            complex_fields_bulk_updated.send(sender=field_model,
+                                             object_ids=[table_object.id])
 
-    def update_field(self, field, dict_values, lang):
+    def update_field(self, field, dict_values, lang, created=False):
+        # The fields of an object created by this update have no rows yet,
+        # so they are created without looking for one.
         field_name = field.get_field_str_id()
+        update = field.update_new if created else field.update
 
         if field_name in dict_values:
 
@@ -144,20 +380,29 @@ class BaseModel(object):
                     'confidence': confidence,
                     'sources': sources,
                 }
-                field.update(dict_values[field_name]['value'], lang, sources)
+                update(dict_values[field_name]['value'], lang, sources)
             else:
-                field.update(dict_values[field_name]['value'], lang)
+                update(dict_values[field_name]['value'], lang)
 
 
     def update(self, dict_values, lang=get_language()):
-        self.save()
+        fields = [field for field in self.complex_fields
+                  if field.get_field_str_id() in dict_values]
+        complex_lists = [complex_list for complex_list in self.complex_lists
+                         if complex_list.get_field_str_id() in dict_values]
+
+        # The rows of this object may have been prefetched, loaded from its
+        # snapshot or from the object cache, none of which the writes use.
+        self.clear_prefetched_complex_fields()
+
+        with transaction.atomic():
+            created = self._state.adding
+            self.save()
 
-        for field in self.complex_fields:
-            if field.get_field_str_id() in dict_values:
-                self.update_field(field, dict_values, lang)
+            for field in fields:
+                self.update_field(field, dict_values, lang, created=created)
 
-        for complex_list in self.complex_lists:
-            if complex_list.get_field_str_id() in dict_values:
+            for complex_list in complex_lists:
                 self.update_list(complex_list, dict_values, lang)
 
     @classmethod
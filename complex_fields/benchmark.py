@@ -0,0 +1,409 @@
+import platform
+import time
+import tracemalloc
+
+import django
+import reversion
+from django.db import IntegrityError, connection, models, transaction
+from django.template import Context, Template
+from django.test.utils import override_settings
+from django_date_extensions.fields import ApproximateDateField
+
+from source.models import AccessPoint, Source
+
+from complex_fields.base_models import BaseModel, prefetch_complex_fields
+from complex_fields.instrumentation import count_queries
+from complex_fields.model_decorators import sourced, translated, versioned
+from complex_fields.models import (ComplexField, ComplexFieldContainer,
+                                   ComplexFieldListContainer,
+                                   get_field_model_descriptor)
+from complex_fields.snapshots import load_snapshots, rebuild_snapshots
+
+
+# Synthetic models covering the combinations of flags and value types of
+# the complex fields. They are only defined when the benchmark runs, and
+# their tables only exist in the test database it creates.
+
+_models = None
+
+
+def get_models():
+    global _models
+    if _models is not None:
+        return _models
+
+    class BenchmarkClassification(models.Model):
+        value = models.CharField(max_length=255, unique=True)
+
+        class Meta:
+            app_label = 'complex_fields'
+
+        def __str__(self):
+            return self.value
+
+    class BenchmarkOrganization(models.Model, BaseModel):
+        def __init__(self, *args, **kwargs):
+            self.name = ComplexFieldContainer(self, BenchmarkOrganizationName)
+            self.classification = ComplexFieldContainer(self, BenchmarkOrganizationClassification)
+            self.active = ComplexFieldContainer(self, BenchmarkOrganizationActive)
+            self.founded = ComplexFieldContainer(self, BenchmarkOrganizationFounded)
+            self.aliases = ComplexFieldListContainer(self, BenchmarkOrganizationAlias)
+
+            self.complex_fields = [self.name, self.classification,
+                                   self.active, self.founded]
+            self.complex_lists = [self.aliases]
+            self.required_fields = ['BenchmarkOrganization_BenchmarkOrganizationName']
+
+            super().__init__(*args, **kwargs)
+
+        class Meta:
+            app_label = 'complex_fields'
+
+    @translated
+    @versioned
+    @sourced
+    class BenchmarkOrganizationName(ComplexField):
+        object_ref = models.ForeignKey(BenchmarkOrganization, on_delete=models.CASCADE)
+        value = models.TextField(default=None, blank=True, null=True)
+        field_name = 'Name'
+
+        class Meta(ComplexField.Meta):
+            app_label = 'complex_fields'
+
+    @versioned
+    @sourced
+    class BenchmarkOrganizationClassification(ComplexField):
+        object_ref = models.ForeignKey(BenchmarkOrganization, on_delete=models.CASCADE)
+        value = models.ForeignKey(BenchmarkClassification, null=True, on_delete=models.CASCADE)
+        field_name = 'Classification'
+
+        class Meta(ComplexField.Meta):
+            app_label = 'complex_fields'
+
+    @versioned
+    class BenchmarkOrganizationActive(ComplexField):
+        object_ref = models.ForeignKey(BenchmarkOrganization, on_delete=models.CASCADE)
+        value = models.BooleanField(default=False)
+        field_name = 'Active'
+
+        class Meta(ComplexField.Meta):
+            app_label = 'complex_fields'
+
+    @sourced
+    class BenchmarkOrganizationFounded(ComplexField):
+        object_ref = models.ForeignKey(BenchmarkOrganization, on_delete=models.CASCADE)
+        value = ApproximateDateField(default=None, blank=True, null=True)
+        field_name = 'Founded'
+
+        class Meta(ComplexField.Meta):
+            app_label = 'complex_fields'
+
+    @translated
+    @sourced
+    class BenchmarkOrganizationAlias(ComplexField):
+        object_ref = models.ForeignKey(BenchmarkOrganization, on_delete=models.CASCADE)
+        value = models.TextField(default=None, blank=True, null=True)
+        field_name = 'Alias'
+
+        class Meta(ComplexField.Meta):
+            app_label = 'complex_fields'
+
+    _models = [
+        BenchmarkClassification,
+        BenchmarkOrganization,
+        BenchmarkOrganizationName,
+        BenchmarkOrganizationClassification,
+        BenchmarkOrganizationActive,
+        BenchmarkOrganizationFounded,
+        BenchmarkOrganizationAlias,
+    ]
+
+    if getattr(connection.features, 'gis_enabled', False):
+        from django.contrib.gis.db import models as gis_models
+
+        @sourced
+        class BenchmarkOrganizationLocation(ComplexField):
+            object_ref = models.ForeignKey(BenchmarkOrganization, on_delete=models.CASCADE)
+            value = gis_models.PointField(blank=True, null=True)
+            field_name = 'Location'
+
+            class Meta(ComplexField.Meta):
+                app_label = 'complex_fields'
+
+        _models.append(BenchmarkOrganizationLocation)
+
+    return _models
+
+
+def create_tables():
+    with connection.schema_editor() as editor:
+        for model in get_models():
+            editor.create_model(model)
+
+
+def create_accesspoints(count):
+    # The source app may require more than a source to create an access
+    # point, in which case the scenarios writing sourced fields fail.
+    try:
+        with transaction.atomic():
+            source = Source.objects.create()
+            return [AccessPoint.objects.create(source=source) for i in range(count)]
+    except (IntegrityError, TypeError, ValueError):
+        return []
+
+
+class Measure(object):
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0
+
+    def __enter__(self):
+        self.counting = count_queries(connection)
+        self.counter = self.counting.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.start
+        self.counting.__exit__(*exc_info)
+        self.queries = self.counter.queries
+
+
+DETAIL_TEMPLATE = '''{% load viewcomplexfield viewcomplexfieldautocomplete viewcomplexfieldboolean viewcomplexfielddate viewcomplexfieldlist %}
+{% view_complex_field object.name object.id path %}
+{% view_complex_field_autocomplete object.classification object.id source_url path %}
+{% view_complex_field_boolean object.active object.id path %}
+{% view_complex_field_date object.founded object.id path %}
+{% view_complex_field_list object.aliases object.id path %}'''
+
+LIST_TEMPLATE = '''{% load viewcomplexfield %}
+{% for object in objects %}{% view_complex_field object.name object.id path %}{% endfor %}'''
+
+
+class UnslottedContainer(object):
+    # The attributes ComplexFieldContainer kept in the __dict__ of every
+    # container before it used __slots__ and shared metadata, as the
+    # reference its memory is compared with.
+    def __init__(self, table_object, field_model, id_=None, field=None):
+        self.table_object = table_object
+        self.field_model = field_model
+        self.descriptor = get_field_model_descriptor(field_model)
+        self.sourced = self.descriptor.sourced
+        self.translated = self.descriptor.translated
+        self.versioned = self.descriptor.versioned
+        if id_ is None and field is not None:
+            id_ = field.pk
+        self.id_ = id_
+        self._field = field
+
+
+def measure_container_memory(table_object, field_model, count,
+                             container_class=ComplexFieldContainer):
+    # Bytes allocated per container when building count list item
+    # containers of field_model on table_object. The metadata shared by
+    # the containers is created before measuring.
+    container_class(table_object, field_model)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        containers = [container_class(table_object, field_model, index)
+                      for index in range(count)]
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    del containers
+    return allocated / count
+
+
+class Benchmark(object):
+    # Runs every scenario at each size and returns the results as a
+    # JSON-serializable dict. Must run against a database holding the
+    # tables of get_models(), see the benchmark_complex_fields command.
+    def __init__(self, sizes, lang='en', accesspoints=3, containers=100000):
+        self.sizes = sizes
+        self.containers = containers
+        self.lang = lang
+        self.accesspoints = create_accesspoints(accesspoints)
+        (self.Classification, self.Organization, self.Name, self.Classified,
+         self.Active, self.Founded, self.Alias) = get_models()[:7]
+
+    def run(self):
+        results = []
+        for size in self.sizes:
+            for scenario in self.get_scenarios():
+                with transaction.atomic():
+                    measure = scenario(size)
+                    transaction.set_rollback(True)
+
+                results.append({
+                    'scenario': scenario.__name__[len('bench_'):],
+                    'size': size,
+                    'queries': measure.queries,
+                    'seconds': measure.seconds,
+                })
+
+        table_object = self.Organization()
+        bytes_per_container = measure_container_memory(
+            table_object, self.Alias, self.containers
+        )
+        bytes_per_unslotted_container = measure_container_memory(
+            table_object, self.Alias, self.containers,
+            container_class=UnslottedContainer
+        )
+        memory = {
+            'containers': self.containers,
+            'bytes_per_container': bytes_per_container,
+            'bytes_per_unslotted_container': bytes_per_unslotted_container,
+            'reduction': 1 - bytes_per_container / bytes_per_unslotted_container,
+        }
+
+        return {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'lang': self.lang,
+            'accesspoints': len(self.accesspoints),
+            'results': results,
+            'memory': memory,
+        }
+
+    def get_scenarios(self):
+        return [getattr(self, name) for name in sorted(dir(self))
+                if name.startswith('bench_')]
+
+    def dict_values(self, index):
+        str_id = self.Organization.__name__ + '_{}'
+        sources = {'sources': self.accesspoints, 'confidence': '2'}
+        return {
+            str_id.format(self.Name.__name__): dict(sources, value='Organization {}'.format(index)),
+            str_id.format(self.Classified.__name__): dict(sources, value='Classification {}'.format(index % 10)),
+            str_id.format(self.Active.__name__): {'value': 'True'},
+            str_id.format(self.Founded.__name__): dict(sources, value='2001-02-03'),
+        }
+
+    def validate(self, object_, index):
+        # Objects that don't validate would be written through another
+        # path than the one measured, if at all.
+        (errors, dict_values) = object_.validate(self.dict_values(index), self.lang)
+        if errors:
+            raise ValueError('The benchmark objects are invalid: {}'.format(
+                ', '.join('{}: {}'.format(field, message)
+                          for field, message in sorted(errors.items()))
+            ))
+        return dict_values
+
+    def create_objects(self, size):
+        objects = []
+        for index in range(size):
+            object_ = self.Organization()
+            dict_values = self.validate(object_, index)
+            object_.update(dict_values, self.lang)
+            objects.append(object_)
+        return objects
+
+    def create_aliases(self, object_, size):
+        self.Alias.objects.bulk_create([
+            self.Alias(object_ref=object_, lang=self.lang, value='Alias {}'.format(index))
+            for index in range(size)
+        ])
+
+    def render(self, template, context):
+        Template(template).render(Context(dict(context, path='/', source_url='/')))
+
+    def bench_create(self, size):
+        with Measure() as measure:
+            self.create_objects(size)
+        return measure
+
+    def bench_update(self, size):
+        objects = self.create_objects(size)
+        objects = list(self.Organization.objects.filter(pk__in=[o.pk for o in objects]))
+        with Measure() as measure:
+            for index, object_ in enumerate(objects):
+                dict_values = self.validate(object_, index + 1)
+                object_.update(dict_values, self.lang)
+        return measure
+
+    def bench_update_list(self, size):
+        object_, other = self.create_objects(2)
+        self.create_aliases(object_, size)
+        self.create_aliases(other, size)
+        # Keep half of the current aliases and copy half of the other
+        # object's ones.
+        values = (list(self.Alias.objects.filter(object_ref=object_)[:size // 2]) +
+                  list(self.Alias.objects.filter(object_ref=other)[:size // 2]))
+        dict_values = {
+            object_.aliases.get_field_str_id(): {
+                'values': values,
+                'sources': self.accesspoints,
+                'confidence': '2',
+            }
+        }
+        with Measure() as measure:
+            object_.update_list(object_.aliases, dict_values, self.lang)
+        return measure
+
+    def bench_translate(self, size):
+        objects = self.create_objects(size)
+        with Measure() as measure:
+            for index, object_ in enumerate(objects):
+                object_.name.translate('Organisation {}'.format(index), 'fr')
+        return measure
+
+    def bench_revert_to_source(self, size):
+        object_, = self.create_objects(1)
+        for index in range(size):
+            with reversion.create_revision():
+                sources = {'sources': self.accesspoints[:index % 2 + 1], 'confidence': '2'}
+                object_.name.update('Organization {}'.format(index), self.lang, sources)
+
+        field = object_.name.get_field(self.lang)
+        source_ids = [accesspoint.source_id for accesspoint in self.accesspoints[:1]]
+        with Measure() as measure:
+            field.revert_to_source(source_ids)
+        return measure
+
+    def bench_render_detail(self, size):
+        object_, = self.create_objects(1)
+        self.create_aliases(object_, size)
+        object_ = self.Organization.objects.get(pk=object_.pk)
+        with Measure() as measure:
+            self.render(DETAIL_TEMPLATE, {'object': object_})
+        return measure
+
+    def bench_render_detail_prefetched(self, size):
+        object_, = self.create_objects(1)
+        self.create_aliases(object_, size)
+        object_ = self.Organization.objects.get(pk=object_.pk)
+        with Measure() as measure:
+            object_.prefetch_complex_fields()
+            self.render(DETAIL_TEMPLATE, {'object': object_})
+        return measure
+
+    def bench_render_list(self, size):
+        self.create_objects(size)
+        with Measure() as measure:
+            objects = list(self.Organization.objects.all())
+            self.render(LIST_TEMPLATE, {'objects': objects})
+        return measure
+
+    def bench_render_list_prefetched(self, size):
+        self.create_objects(size)
+        with Measure() as measure:
+            objects = prefetch_complex_fields(self.Organization.objects.all(),
+                                              lang=self.lang)
+            self.render(LIST_TEMPLATE, {'objects': objects})
+        return measure
+
+    def bench_render_list_snapshots(self, size):
+        # Snapshots are rebuilt on commit, which never happens here.
+        objects = self.create_objects(size)
+        with override_settings(COMPLEX_FIELDS_SNAPSHOTS=True,
+                               COMPLEX_FIELDS_SNAPSHOT_LANGUAGES=[self.lang]):
+            rebuild_snapshots(self.Organization, [o.pk for o in objects])
+            with Measure() as measure:
+                objects = load_snapshots(self.Organization.objects.all(), self.lang)
+                self.render(LIST_TEMPLATE, {'objects': objects})
+        return measure
@@ -0,0 +1,212 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import get_language
+
+from complex_fields.base_models import (BaseModel, get_saved_object_ids,
+                                        object_ref_saved,
+                                        prefetch_complex_fields)
+from complex_fields.models import (complex_fields_bulk_updated,
+                                   field_model_descriptors, get_object_model)
+
+
+# Opt-in cache of the contexts computed by the view_complex_field* template
+# tags. COMPLEX_FIELDS_TEMPLATE_CACHE names the cache to use (None, the
+# default, disables it). Every object has a generation in the cache that is
+# part of the keys of its contexts and is replaced whenever one of its
+# complex fields or the object itself is saved or deleted, and again when
+# the transaction of that write commits.
+#
+# COMPLEX_FIELDS_OBJECT_CACHE names the cache of the objects loaded by
+# field_from_str_and_id, with the rows of their complex fields, kept for
+# COMPLEX_FIELDS_OBJECT_CACHE_TIMEOUT seconds and dropped on the same
+# events. Writes never trust these rows, the containers read the rows they
+# update from the database.
+
+KEY_PREFIX = 'complex_fields'
+
+
+def get_cache():
+    alias = getattr(settings, 'COMPLEX_FIELDS_TEMPLATE_CACHE', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_timeout():
+    return getattr(settings, 'COMPLEX_FIELDS_TEMPLATE_CACHE_TIMEOUT', 300)
+
+
+def get_generation_key(model, pk):
+    return '{}:generation:{}:{}'.format(KEY_PREFIX, model._meta.label_lower, pk)
+
+
+def get_generation(cache, model, pk):
+    key = get_generation_key(model, pk)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_field_context(tag, field, build_context):
+    # Return the context computed by build_context(field), from the cache
+    # when it is enabled and the field belongs to a saved object. Contexts
+    # only hold plain values, a row would be pickled with its object and
+    # the object's prefetched rows.
+    cache = get_cache()
+    table_object = field.table_object
+    if cache is None or table_object.pk is None:
+        return build_context(field)
+
+    key = '{}:context:{}:{}:{}:{}:{}:{}:{}'.format(
+        KEY_PREFIX,
+        tag,
+        table_object._meta.label_lower,
+        table_object.pk,
+        field.field_model._meta.label_lower,
+        getattr(field, 'id_', None),
+        get_language(),
+        get_generation(cache, table_object.__class__, table_object.pk),
+    )
+
+    context = cache.get(key)
+    if context is None:
+        context = build_context(field)
+        cache.set(key, context, get_timeout())
+    return context
+
+
+def get_object_cache():
+    alias = getattr(settings, 'COMPLEX_FIELDS_OBJECT_CACHE', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_object_key(model, pk):
+    return '{}:object:{}:{}'.format(KEY_PREFIX, model._meta.label_lower, pk)
+
+
+def get_row_values(row):
+    return [getattr(row, field.attname) for field in row._meta.concrete_fields]
+
+
+def get_object(model, pk):
+    # model.from_id(pk) with the rows of its complex fields prefetched, from
+    # the object cache when it is enabled.
+    cache = get_object_cache()
+    if cache is None:
+        return model.from_id(pk)
+
+    key = get_object_key(model, pk)
+    data = cache.get(key)
+    if data is not None:
+        # The object and its rows are cached as the values of their columns
+        # and rebuilt as if they were loaded from the database.
+        (values, rows) = data
+        database = router.db_for_read(model)
+        field_names = [field.attname for field in model._meta.concrete_fields]
+        object_ = model.from_db(database, field_names, values)
+
+        object_._complex_field_rows = {}
+        for (field_model, lang), field_rows in rows.items():
+            field_names = [field.attname for field in field_model._meta.concrete_fields]
+            object_._complex_field_rows[(field_model, lang)] = [
+                field_model.from_db(database, field_names, row_values)
+                for row_values in field_rows
+            ]
+            for row in object_._complex_field_rows[(field_model, lang)]:
+                row.object_ref = object_
+        return object_
+
+    object_ = model.from_id(pk)
+    if object_ is None:
+        return None
+
+    prefetch_complex_fields([object_])
+    rows = {
+        row_key: [get_row_values(row) for row in field_rows]
+        for row_key, field_rows in object_._complex_field_rows.items()
+    }
+    cache.set(key, (get_row_values(object_), rows),
+              getattr(settings, 'COMPLEX_FIELDS_OBJECT_CACHE_TIMEOUT', 30))
+    return object_
+
+
+_pending = threading.local()
+
+
+def invalidate_object(model, pk):
+    context_cache = get_cache()
+    object_cache = get_object_cache()
+    if context_cache is None and object_cache is None:
+        return
+
+    drop_object(context_cache, object_cache, model, pk)
+
+    # A read between the write and the commit sees the rows of before the
+    # write and caches them again, so they are dropped once more when the
+    # transaction commits.
+    pending = getattr(_pending, 'objects', None)
+    if pending is None:
+        pending = _pending.objects = set()
+    pending.add((model, pk))
+
+    transaction.on_commit(flush_invalidations, using=router.db_for_write(model))
+
+
+def drop_object(context_cache, object_cache, model, pk):
+    if context_cache is not None:
+        context_cache.set(get_generation_key(model, pk), uuid.uuid4().hex, None)
+    if object_cache is not None:
+        object_cache.delete(get_object_key(model, pk))
+
+
+def flush_invalidations():
+    pending = getattr(_pending, 'objects', None)
+    _pending.objects = set()
+
+    context_cache = get_cache()
+    object_cache = get_object_cache()
+    for model, pk in pending or ():
+        drop_object(context_cache, object_cache, model, pk)
+
+
+def invalidate_field_object(sender, instance, **kwargs):
+    if sender not in field_model_descriptors:
+        return
+
+    invalidate_object(get_object_model(sender), instance.object_ref_id)
+
+post_save.connect(invalidate_field_object)
+post_delete.connect(invalidate_field_object)
+
+
+def invalidate_field_objects(sender, object_ids, **kwargs):
+    object_model = get_object_model(sender)
+    for object_id in object_ids:
+        invalidate_object(object_model, object_id)
+
+complex_fields_bulk_updated.connect(invalidate_field_objects)
+
+
+def invalidate_saved_object(sender, object_id, **kwargs):
+    if get_cache() is not None or get_object_cache() is not None:
+        for pk in get_saved_object_ids(sender, object_id):
+            invalidate_object(sender, pk)
+
+object_ref_saved.connect(invalidate_saved_object)
+
+
+def invalidate_base_model_object(sender, instance, **kwargs):
+    if isinstance(instance, BaseModel):
+        invalidate_object(sender, instance.pk)
+
+post_save.connect(invalidate_base_model_object)
+post_delete.connect(invalidate_base_model_object)
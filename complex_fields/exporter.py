@@ -0,0 +1,107 @@
+import json
+
+from complex_fields.base_models import (PREFETCH_BATCH_SIZE,
+                                        prefetch_complex_fields)
+from complex_fields.importer import chunked
+from complex_fields.models import get_accesspoint_ids
+from complex_fields.serializers import serialize_row
+
+
+# Records hold the id of an object and, keyed by get_field_str_id(), every
+# row of its complex fields and lists:
+# {'id': ..., 'fields': {<field>: [{'id': ..., 'lang': ..., 'value': ...,
+#  'confidence': ..., 'sources': [<access point ids>]}]}}
+# Values are serialized with value_to_string() of their model field.
+
+
+def write_ndjson(file_, records):
+    for record in records:
+        file_.write(json.dumps(record, sort_keys=True))
+        file_.write('\n')
+
+
+def write_json(file_, records):
+    # Written one record at a time, like NDJSON.
+    file_.write('[')
+    for index, record in enumerate(records):
+        if index:
+            file_.write(',')
+        file_.write('\n')
+        file_.write(json.dumps(record, sort_keys=True))
+    file_.write('\n]\n')
+
+
+WRITERS = {
+    'json': write_json,
+    'ndjson': write_ndjson,
+}
+
+
+class Exporter(object):
+    # Streams the complex field rows of every object of a BaseModel
+    # subclass one chunk of objects at a time: objects are read through
+    # a server-side cursor, and every chunk loads the rows of each field
+    # model and their access points with one query per model (per batch
+    # of PREFETCH_BATCH_SIZE objects or rows). Only one chunk is held in
+    # memory.
+    def __init__(self, model, fields=None, langs=None, chunk_size=500):
+        self.model = model
+        self.fields = fields
+        self.langs = set(langs) if langs else None
+        self.chunk_size = chunk_size
+        self.exported = 0
+
+    def get_queryset(self):
+        return self.model._default_manager.order_by('pk')
+
+    def run(self):
+        objects = self.get_queryset().iterator(chunk_size=self.chunk_size)
+        for chunk in chunked(objects, self.chunk_size):
+            for record in self.export_chunk(chunk):
+                self.exported += 1
+                yield record
+
+    def get_containers(self, object_):
+        containers = object_.complex_fields + object_.complex_lists
+        if self.fields is not None:
+            containers = [container for container in containers
+                          if container.get_field_str_id() in self.fields]
+        return containers
+
+    def get_rows(self, object_, container):
+        rows = object_._complex_field_rows[(container.field_model, None)]
+        if self.langs is not None and container.descriptor.translated:
+            rows = [row for row in rows if row.lang in self.langs]
+        return rows
+
+    def export_chunk(self, chunk):
+        containers = self.get_containers(chunk[0])
+        prefetch_complex_fields(
+            chunk, fields=[container.field_model for container in containers]
+        )
+
+        source_ids = {}
+        for container in containers:
+            if container.descriptor.sourced:
+                row_ids = [row.pk for object_ in chunk
+                           for row in self.get_rows(object_, container)]
+                field_source_ids = source_ids[container.field_model] = {}
+                for start in range(0, len(row_ids), PREFETCH_BATCH_SIZE):
+                    field_source_ids.update(get_accesspoint_ids(
+                        container.field_model,
+                        row_ids[start:start + PREFETCH_BATCH_SIZE]
+                    ))
+
+        for object_ in chunk:
+            fields = {}
+            for container in self.get_containers(object_):
+                field_source_ids = source_ids.get(container.field_model, {})
+                fields[container.get_field_str_id()] = [
+                    serialize_row(row, field_source_ids.get(row.pk, set()))
+                    for row in self.get_rows(object_, container)
+                ]
+
+            yield {
+                'id': object_._meta.pk.value_to_string(object_),
+                'fields': fields,
+            }
@@ -0,0 +1,210 @@
+import csv
+import itertools
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from source.models import AccessPoint
+
+from complex_fields.models import ForeignKeyResolver
+
+
+# Records use the dict_values format of BaseModel.create, keyed by
+# get_field_str_id(). A field can be given as a plain value or as
+# {'value': ..., 'sources': [<access point ids>], 'confidence': ...}.
+# In CSV files the sources and confidence of a field go in the
+# "<field>.sources" (ids separated by ";") and "<field>.confidence" columns.
+
+CSV_SOURCES_SUFFIX = '.sources'
+CSV_CONFIDENCE_SUFFIX = '.confidence'
+CSV_SOURCES_SEPARATOR = ';'
+
+
+def read_ndjson(file_):
+    for line in file_:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_json(file_):
+    # A JSON document has to be parsed whole, use NDJSON for large dumps.
+    records = json.load(file_)
+    if isinstance(records, dict):
+        records = [records]
+    for record in records:
+        yield record
+
+
+def read_csv(file_):
+    for row in csv.DictReader(file_):
+        record = {}
+        for column, cell in row.items():
+            if column.endswith(CSV_SOURCES_SUFFIX):
+                field = record.setdefault(column[:-len(CSV_SOURCES_SUFFIX)], {})
+                field['sources'] = [source_id for source_id in
+                                    cell.split(CSV_SOURCES_SEPARATOR) if source_id]
+            elif column.endswith(CSV_CONFIDENCE_SUFFIX):
+                field = record.setdefault(column[:-len(CSV_CONFIDENCE_SUFFIX)], {})
+                field['confidence'] = cell
+            else:
+                record.setdefault(column, {})['value'] = cell
+        yield record
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def chunked(records, chunk_size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_record(record):
+    dict_values = {}
+    for field_name, field in record.items():
+        if not isinstance(field, dict):
+            field = {'value': field}
+        else:
+            field = dict(field)
+
+        value = field.get('value')
+        if value is None:
+            value = ""
+        elif not isinstance(value, str):
+            value = str(value)
+        field['value'] = value
+
+        dict_values[field_name] = field
+    return dict_values
+
+
+class ChunkReport(object):
+    def __init__(self, number, start):
+        self.number = number
+        self.start = start
+        self.records = 0
+        self.imported = 0
+        self.errors = []
+        self.elapsed = 0
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def rate(self):
+        if not self.elapsed:
+            return 0
+        return self.records / self.elapsed
+
+
+class Importer(object):
+    # Streams records into a BaseModel subclass one chunk at a time: every
+    # chunk resolves its access points and ForeignKey values with one query
+    # per model, is validated, and is committed in its own transaction.
+    # Only one chunk is held in memory.
+    def __init__(self, model, lang, chunk_size=500):
+        self.model = model
+        self.lang = lang
+        self.chunk_size = chunk_size
+
+    def run(self, records):
+        start = 0
+        for number, chunk in enumerate(chunked(records, self.chunk_size), 1):
+            yield self.import_chunk(number, start, chunk)
+            start += len(chunk)
+
+    def import_chunk(self, number, start, chunk):
+        report = ChunkReport(number, start)
+        report.records = len(chunk)
+        started = time.time()
+
+        chunk = [normalize_record(record) for record in chunk]
+        accesspoints = self.get_accesspoints(chunk)
+        resolver = ForeignKeyResolver()
+
+        records = []
+        for index, dict_values in enumerate(chunk, start):
+            errors = self.attach_sources(dict_values, accesspoints)
+            if errors:
+                report.errors.append((index, errors))
+                continue
+
+            records.append((index, dict_values))
+
+        with transaction.atomic():
+            validated = self.model.validate_batch(
+                [dict_values for index, dict_values in records], self.lang,
+                resolver=resolver
+            )
+            for (index, record), (errors, dict_values) in zip(records, validated):
+                if errors:
+                    report.errors.append((index, {
+                        field_name: str(error) for field_name, error in errors.items()
+                    }))
+                    continue
+
+                try:
+                    with transaction.atomic():
+                        self.model().update(dict_values, self.lang)
+                except Exception as e:
+                    report.errors.append((index, {'__all__': str(e)}))
+                else:
+                    report.imported += 1
+
+        report.errors.sort(key=lambda error: error[0])
+        report.elapsed = time.time() - started
+        return report
+
+    def get_accesspoint_id(self, source_id):
+        try:
+            return str(AccessPoint._meta.pk.to_python(source_id))
+        except ValidationError:
+            return None
+
+    def get_accesspoints(self, chunk):
+        accesspoint_ids = set()
+        for dict_values in chunk:
+            for field in dict_values.values():
+                for source_id in field.get('sources', []):
+                    accesspoint_ids.add(self.get_accesspoint_id(source_id))
+        accesspoint_ids.discard(None)
+
+        if not accesspoint_ids:
+            return {}
+
+        return {
+            str(pk): accesspoint for pk, accesspoint in
+            AccessPoint.objects.in_bulk(list(accesspoint_ids)).items()
+        }
+
+    def attach_sources(self, dict_values, accesspoints):
+        errors = {}
+        for field_name, field in dict_values.items():
+            if 'sources' not in field:
+                continue
+
+            accesspoint_ids = [self.get_accesspoint_id(source_id)
+                               for source_id in field['sources']]
+            missing = [str(source_id) for source_id, accesspoint_id
+                       in zip(field['sources'], accesspoint_ids)
+                       if accesspoint_id not in accesspoints]
+            if missing:
+                errors[field_name] = 'Unknown access points: {}'.format(
+                    ', '.join(missing)
+                )
+            else:
+                field['sources'] = [accesspoints[accesspoint_id]
+                                    for accesspoint_id in accesspoint_ids]
+        return errors
@@ -0,0 +1,175 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import django.dispatch
+from django.conf import settings
+from django.db import connections, router
+
+
+logger = logging.getLogger(__name__)
+
+# Sent after every instrumented container operation while instrumentation
+# is active, with the arguments operation, field_model, queries, db_time,
+# wall_time and depth. queries and db_time include the nested operations.
+container_operation = django.dispatch.Signal()
+
+_state = threading.local()
+
+
+def get_collectors():
+    collectors = getattr(_state, 'collectors', None)
+    if collectors is None:
+        collectors = _state.collectors = []
+    return collectors
+
+
+def is_active():
+    return bool(get_collectors() or container_operation.receivers or
+                getattr(settings, 'COMPLEX_FIELDS_INSTRUMENTATION', False))
+
+
+class OperationRecord(object):
+    def __init__(self, operation, field_model, queries, db_time, wall_time, depth):
+        self.operation = operation
+        self.field_model = field_model
+        self.queries = queries
+        self.db_time = db_time
+        self.wall_time = wall_time
+        self.depth = depth
+
+    def as_dict(self):
+        return {
+            'operation': self.operation,
+            'field_model': self.field_model,
+            'queries': self.queries,
+            'db_time': self.db_time,
+            'wall_time': self.wall_time,
+            'depth': self.depth,
+        }
+
+
+class OperationCollector(list):
+    def summary(self):
+        # Totals per (field model, operation). Each total includes the
+        # queries of the operations it called, see queries for the overall
+        # count.
+        totals = {}
+        for record in self:
+            key = (record.field_model, record.operation)
+            total = totals.setdefault(key, {
+                'field_model': record.field_model,
+                'operation': record.operation,
+                'calls': 0,
+                'queries': 0,
+                'db_time': 0,
+                'wall_time': 0,
+            })
+            total['calls'] += 1
+            total['queries'] += record.queries
+            total['db_time'] += record.db_time
+            total['wall_time'] += record.wall_time
+
+        return sorted(totals.values(), key=lambda total: -total['queries'])
+
+    @property
+    def queries(self):
+        # Only the outermost operations are counted, so the queries of an
+        # operation called by another one are not counted twice.
+        return sum(record.queries for record in self if record.depth == 0)
+
+
+@contextmanager
+def track_operations():
+    collector = OperationCollector()
+    collectors = get_collectors()
+    collectors.append(collector)
+    try:
+        yield collector
+    finally:
+        collectors.remove(collector)
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+@contextmanager
+def count_queries(connection):
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def instrumented(operation):
+    # Decorator for the methods of the containers, recording the queries,
+    # database time and wall time of each call when instrumentation is
+    # active.
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not is_active():
+                return method(self, *args, **kwargs)
+
+            depth = getattr(_state, 'depth', 0)
+            connection = connections[router.db_for_read(self.field_model)]
+
+            _state.depth = depth + 1
+            start = time.perf_counter()
+            counter = None
+            try:
+                with count_queries(connection) as counter:
+                    return method(self, *args, **kwargs)
+            finally:
+                _state.depth = depth
+                # counter is None when counting the queries failed, and
+                # that error is raised without a record.
+                if counter is not None:
+                    record = OperationRecord(
+                        operation, self.field_model.__name__, counter.queries,
+                        counter.db_time, time.perf_counter() - start, depth
+                    )
+                    for collector in get_collectors():
+                        collector.append(record)
+                    container_operation.send(sender=self.__class__, **record.as_dict())
+
+        return wrapper
+    return decorator
+
+
+class InstrumentationMiddleware(object):
+    # Logs a summary of the container operations of every request, and
+    # adds their total query count in a response header when
+    # COMPLEX_FIELDS_INSTRUMENTATION_HEADER is set.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_operations() as operations:
+            response = self.get_response(request)
+
+        if operations:
+            for total in operations.summary():
+                logger.debug(
+                    '%s %s.%s: %d calls, %d queries, %.1fms db, %.1fms total',
+                    request.path, total['field_model'], total['operation'],
+                    total['calls'], total['queries'], total['db_time'] * 1000,
+                    total['wall_time'] * 1000
+                )
+
+        if getattr(settings, 'COMPLEX_FIELDS_INSTRUMENTATION_HEADER', False):
+            response['X-Complex-Fields-Queries'] = str(operations.queries)
+
+        return response
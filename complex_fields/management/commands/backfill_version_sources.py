@@ -0,0 +1,47 @@
+import itertools
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reversion.models import Version
+
+from complex_fields.models import VersionSources, field_model_descriptors
+
+
+class Command(BaseCommand):
+    help = 'Index the sources of the existing versions of versioned complex fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of versions indexed per transaction')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop the existing index before filling it')
+
+    def handle(self, *args, **options):
+        field_models = [field_model for field_model, descriptor
+                        in field_model_descriptors.items()
+                        if descriptor.versioned]
+        content_types = ContentType.objects.get_for_models(*field_models).values()
+
+        if options['rebuild']:
+            VersionSources.objects.filter(content_type__in=content_types).delete()
+
+        versions = Version.objects.filter(
+            content_type__in=content_types
+        ).exclude(
+            pk__in=VersionSources.objects.values('version_id')
+        ).order_by('pk').iterator()
+
+        indexed = 0
+        while True:
+            chunk = list(itertools.islice(versions, options['chunk_size']))
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                indexed += VersionSources.objects.index_versions(chunk)
+
+            self.stdout.write('Indexed {} versions'.format(indexed))
+
+        self.stdout.write('Done, {} versions indexed'.format(indexed))
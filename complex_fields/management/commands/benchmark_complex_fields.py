@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = ('Measure the queries and time of the complex field read and write '
+            'paths on synthetic models, in a throwaway test database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000',
+                            help='Comma separated sizes to run every scenario at')
+        parser.add_argument('--lang', default='en')
+        parser.add_argument('--accesspoints', type=int, default=3,
+                            help='Number of access points attached to sourced fields')
+        parser.add_argument('--containers', type=int, default=100000,
+                            help='Number of containers built to measure their memory')
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+
+        # The test database uses the engine of the default database, so run
+        # this with settings pointing to a local SQLite or Postgres.
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            from complex_fields.benchmark import Benchmark, create_tables
+
+            create_tables()
+            results = Benchmark(sizes, lang=options['lang'],
+                                accesspoints=options['accesspoints'],
+                                containers=options['containers']).run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
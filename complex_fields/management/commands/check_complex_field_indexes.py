@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from complex_fields.models import field_model_descriptors, get_lookup_index_fields
+
+
+class Command(BaseCommand):
+    help = 'Report the complex field tables missing their lookup indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true',
+                            help='Exit with an error when an index is missing')
+
+    def handle(self, *args, **options):
+        missing = 0
+
+        for field_model in sorted(field_model_descriptors,
+                                  key=lambda model: model._meta.label):
+            meta = field_model._meta
+            if meta.abstract or not meta.managed or meta.proxy:
+                continue
+
+            connection = connections[router.db_for_read(field_model)]
+            with connection.cursor() as cursor:
+                if meta.db_table not in connection.introspection.table_names(cursor):
+                    continue
+                constraints = connection.introspection.get_constraints(cursor, meta.db_table)
+
+            # An index covers the lookups when the columns are its first ones.
+            indexed = [tuple(constraint['columns']) for constraint in constraints.values()
+                       if constraint['index'] or constraint['unique']]
+
+            expected = [(fields, False) for fields in get_lookup_index_fields(field_model)]
+            expected += [(tuple(fields), True) for fields in meta.unique_together]
+
+            for fields, unique in expected:
+                columns = tuple(meta.get_field(name).column for name in fields)
+                if unique:
+                    found = any(constraint['unique'] and
+                                tuple(constraint['columns']) == columns
+                                for constraint in constraints.values())
+                else:
+                    found = any(index[:len(columns)] == columns for index in indexed)
+
+                if not found:
+                    missing += 1
+                    self.stdout.write('{}: missing {} on {} ({})'.format(
+                        meta.label,
+                        'unique constraint' if unique else 'index',
+                        meta.db_table,
+                        ', '.join(columns),
+                    ))
+
+        if missing and options['fail']:
+            raise CommandError('{} indexes missing'.format(missing))
+
+        self.stdout.write('Done, {} indexes missing'.format(missing))
@@ -0,0 +1,56 @@
+import sys
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from complex_fields.exporter import WRITERS, Exporter
+
+
+class Command(BaseCommand):
+    help = 'Export the complex fields of every object of a model to a JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model to export, as app_label.ModelName')
+        parser.add_argument('path', help='File to write, - for stdout')
+        parser.add_argument('--format', choices=sorted(WRITERS), default=None,
+                            help='Format of the file, guessed from its extension by default')
+        parser.add_argument('--fields', default=None,
+                            help='Comma separated field ids to export, all by default')
+        parser.add_argument('--langs', default=None,
+                            help='Comma separated languages of the translated fields to export, all by default')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of objects loaded together')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError):
+            raise CommandError('Unknown model {}'.format(options['model']))
+
+        format_ = options['format']
+        if format_ is None:
+            format_ = options['path'].rsplit('.', 1)[-1].lower()
+        if format_ not in WRITERS:
+            raise CommandError('Cannot guess the format of {}, use --format'.format(options['path']))
+
+        fields = langs = None
+        if options['fields']:
+            fields = set(field for field in options['fields'].split(',') if field)
+        if options['langs']:
+            langs = [lang for lang in options['langs'].split(',') if lang]
+
+        exporter = Exporter(model, fields=fields, langs=langs,
+                            chunk_size=options['chunk_size'])
+
+        started = time.time()
+
+        if options['path'] == '-':
+            WRITERS[format_](sys.stdout, exporter.run())
+            sys.stdout.flush()
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file_:
+                WRITERS[format_](file_, exporter.run())
+
+        elapsed = time.time() - started
+        self.stderr.write('Exported {} records in {:.1f}s'.format(exporter.exported, elapsed))
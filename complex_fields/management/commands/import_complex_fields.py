@@ -0,0 +1,70 @@
+import io
+import sys
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import get_language
+
+from complex_fields.importer import READERS, Importer
+
+
+class Command(BaseCommand):
+    help = 'Import records of complex fields from a CSV, JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model to import, as app_label.ModelName')
+        parser.add_argument('path', help='File to import, - for stdin')
+        parser.add_argument('--format', choices=sorted(READERS), default=None,
+                            help='Format of the file, guessed from its extension by default')
+        parser.add_argument('--lang', default=None,
+                            help='Language of the imported values')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of records validated and committed together')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError):
+            raise CommandError('Unknown model {}'.format(options['model']))
+
+        format_ = options['format']
+        if format_ is None:
+            format_ = options['path'].rsplit('.', 1)[-1].lower()
+        if format_ not in READERS:
+            raise CommandError('Cannot guess the format of {}, use --format'.format(options['path']))
+
+        lang = options['lang'] or get_language()
+        importer = Importer(model, lang, chunk_size=options['chunk_size'])
+
+        if options['path'] == '-':
+            file_ = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            file_ = open(options['path'], encoding='utf-8', newline='')
+
+        records = imported = failed = 0
+        started = time.time()
+
+        with file_:
+            for report in importer.run(READERS[format_](file_)):
+                records += report.records
+                imported += report.imported
+                failed += report.failed
+
+                self.stdout.write(
+                    'Chunk {}: {} records, {} imported, {} failed ({:.1f} records/s)'.format(
+                        report.number, report.records, report.imported,
+                        report.failed, report.rate
+                    )
+                )
+
+                for index, errors in report.errors:
+                    for field_name, error in sorted(errors.items()):
+                        self.stderr.write('Record {}: {}: {}'.format(index, field_name, error))
+
+        elapsed = time.time() - started
+        self.stdout.write(
+            'Imported {} of {} records in {:.1f}s ({} failed)'.format(
+                imported, records, elapsed, failed
+            )
+        )
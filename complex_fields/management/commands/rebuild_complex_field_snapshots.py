@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from complex_fields.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the complex field snapshots of every object of a model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model label, e.g. person.Person')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of objects rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+
+        object_ids = list(model._default_manager.order_by('pk')
+                                                .values_list('pk', flat=True))
+
+        rebuilt = 0
+        for start in range(0, len(object_ids), options['chunk_size']):
+            chunk = object_ids[start:start + options['chunk_size']]
+            rebuild_snapshots(model, chunk)
+            rebuilt += len(chunk)
+
+            self.stdout.write('Rebuilt {} snapshots'.format(rebuilt))
+
+        self.stdout.write('Done, {} objects rebuilt'.format(rebuilt))
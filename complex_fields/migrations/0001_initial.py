@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-17 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('reversion', '0001_squashed_0004_auto_20160611_1202'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionSources',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(max_length=191)),
+                ('sources_hash', models.CharField(max_length=40)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('version', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='complex_field_sources', to='reversion.version')),
+            ],
+            options={
+                'index_together': {('content_type', 'object_id', 'sources_hash', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-17 16:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('complex_fields', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplexFieldSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(max_length=191)),
+                ('lang', models.CharField(max_length=5)),
+                ('data', models.TextField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id', 'lang')},
+            },
+        ),
+    ]
@@ -7,22 +7,28 @@ from reversion import register
 from django.db import models
 from source.models import Source
 
+from complex_fields.models import get_field_model_descriptor
+
 
 def translated(orig_cls):
     orig_cls.translated = True
+    get_field_model_descriptor(orig_cls).refresh()
     return orig_cls
 
 def versioned(orig_cls):
     orig_cls.versioned = True
     register(orig_cls)
+    get_field_model_descriptor(orig_cls).refresh()
     return orig_cls
 
 def sourced(orig_cls):
     orig_cls.sourced = True
     orig_cls.source_required = True
+    get_field_model_descriptor(orig_cls).refresh()
     return orig_cls
 
 def sourced_optional(orig_cls):
     orig_cls.sourced = True
     orig_cls.source_required = False
+    get_field_model_descriptor(orig_cls).refresh()
     return orig_cls
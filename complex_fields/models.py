@@ -1,18 +1,39 @@
+import django.dispatch
+import functools
+import hashlib
 import inspect
+import itertools
 import reversion
 import re
-
-from django.db import models
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, models, router, transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.signals import class_prepared, post_delete, post_save
 from django.db.utils import IntegrityError
 from django.core.exceptions import ValidationError, FieldDoesNotExist
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext as _
 from django.utils.translation import get_language
 
 from languages_plus.models import Language
+from reversion.models import Version
+from reversion.signals import post_revision_commit
 
 from source.models import AccessPoint, Source
 from sfm_pc.utils import class_for_name
 
+from complex_fields.instrumentation import instrumented
+
+
+# Sent when complex field rows of objects were written without save() or
+# delete(), which receivers of post_save and post_delete would miss. Sent
+# with the argument object_ids, the ids of the objects the rows belong to.
+complex_fields_bulk_updated = django.dispatch.Signal()
+
 
 CONFIDENCE_LEVELS = (
     ('1', _('Low')),
@@ -27,8 +48,57 @@ class ComplexField(models.Model):
     accesspoints = models.ManyToManyField(AccessPoint, related_name="%(app_label)s_%(class)s_related")
     confidence = models.CharField(max_length=1, default=1, choices=CONFIDENCE_LEVELS)
 
+    # Field models declaring their own Meta must subclass ComplexField.Meta
+    # to keep its index, e.g. class Meta(ComplexField.Meta). Its name is
+    # generated per field model, names built from the app label and the
+    # class name would often go past the 30 characters Django allows.
     class Meta:
         abstract = True
+        indexes = [
+            models.Index(fields=['object_ref', 'lang']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        # Names of the fields changed since the row was loaded or saved,
+        # None when it was neither.
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or self._state.adding:
+            return None
+
+        return self.get_changed_fields(loaded)
+
+    def get_changed_fields(self, values):
+        # Names of the loaded fields whose value differs from the one in
+        # values, a dict of attribute names to values.
+        changed = []
+        for field in self._meta.concrete_fields:
+            if field.attname not in values or field.attname not in self.__dict__:
+                continue
+
+            value = getattr(self, field.attname)
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                pass
+
+            if value != values[field.attname]:
+                changed.append(field.name)
+
+        return changed
 
     def revert(self, id):
         if hasattr(self, 'versioned'):
@@ -38,18 +108,15 @@ class ComplexField(models.Model):
 
     def revert_to_source(self, source_ids):
         if hasattr(self, 'versioned'):
-            versions = reversion.get_for_object(self)
-            version = None
-            max_id = 0
-            for vers in versions:
-                if vers.field_dict['sources'] == source_ids and vers.id > max_id:
-                    version = vers
-                    max_id = vers.id
-
-            if version is None:
-                for vers in versions:
-                    if vers.field_dict['sources'] == [] and vers.id > max_id:
-                        version = vers
+            version = VersionSources.objects.get_latest_version(self, source_ids)
+
+            if (version is None and
+                    VersionSources.objects.has_unindexed_versions(self)):
+                # Part of the history of this object has not been indexed
+                # yet, the version may be among it.
+                version = self.find_version_by_sources(source_ids)
+            elif version is None:
+                version = VersionSources.objects.get_oldest_version(self, [])
 
             if version is not None:
                 try:
@@ -59,48 +126,703 @@ class ComplexField(models.Model):
                     # we ignore it.
                     pass
 
+    def find_version_by_sources(self, source_ids):
+        # The newest version with the given sources, or else the oldest
+        # version without sources.
+        versions = Version.objects.get_for_object(self).order_by('-pk')
+        source_ids = set(str(source_id) for source_id in source_ids)
+
+        unsourced = None
+        for vers in versions:
+            sources = set(str(source_id) for source_id in vers.field_dict['sources'])
+            if sources == source_ids:
+                return vers
+            if not sources:
+                unsourced = vers
+
+        return unsourced
+
     def __str__(self):
         if self.value is None:
             return ""
         return str(self.value)
 
 
+def get_sources_hash(source_ids):
+    # Hash of a set of source ids, independent of their order and of how
+    # each id is written.
+    source_ids = sorted(set(
+        str(Source._meta.pk.to_python(source_id)) for source_id in source_ids
+    ))
+    return hashlib.sha1(','.join(source_ids).encode('utf-8')).hexdigest()
+
+
+class VersionSourcesManager(models.Manager):
+    def get_versions(self, field, source_ids):
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(field),
+            object_id=str(field.pk),
+            sources_hash=get_sources_hash(source_ids),
+        ).select_related('version')
+
+    def get_latest_version(self, field, source_ids):
+        version_sources = self.get_versions(field, source_ids).order_by('-version_id').first()
+        if version_sources is None:
+            return None
+        return version_sources.version
+
+    def get_oldest_version(self, field, source_ids):
+        version_sources = self.get_versions(field, source_ids).order_by('version_id').first()
+        if version_sources is None:
+            return None
+        return version_sources.version
+
+    def has_unindexed_versions(self, field):
+        # Versions recorded before the index existed and not indexed since
+        # by the backfill_version_sources command.
+        return Version.objects.get_for_object(field).filter(
+            complex_field_sources__isnull=True
+        ).exists()
+
+    def index_versions(self, versions):
+        # Create the rows of the given versions of versioned complex
+        # fields, skipping versions of any other model.
+        rows = []
+        for version in versions:
+            model = ContentType.objects.get_for_id(version.content_type_id).model_class()
+            descriptor = field_model_descriptors.get(model)
+            if descriptor is None or not descriptor.versioned:
+                continue
+
+            rows.append(self.model(
+                version=version,
+                content_type_id=version.content_type_id,
+                object_id=version.object_id,
+                sources_hash=get_sources_hash(version.field_dict.get('sources', [])),
+            ))
+
+        self.bulk_create(rows)
+        return len(rows)
+
+
+class VersionSources(models.Model):
+    # The set of sources saved in each version of a versioned complex
+    # field, so revert_to_source finds the newest version with a given set
+    # of sources with one indexed query instead of deserializing every
+    # version of the field.
+    version = models.OneToOneField(Version, on_delete=models.CASCADE,
+                                   related_name='complex_field_sources')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=191)
+    sources_hash = models.CharField(max_length=40)
+
+    objects = VersionSourcesManager()
+
+    class Meta:
+        index_together = [
+            ('content_type', 'object_id', 'sources_hash', 'version'),
+        ]
+
+
+class ComplexFieldSnapshot(models.Model):
+    # The current value and confidence of every complex field of an object
+    # in one language, as JSON, kept by
+    # complex_fields.snapshots when COMPLEX_FIELDS_SNAPSHOTS is set.
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=191)
+    lang = models.CharField(max_length=5)
+    data = models.TextField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [
+            ('content_type', 'object_id', 'lang'),
+        ]
+
+
+def index_revision_versions(sender, revision, versions, **kwargs):
+    VersionSources.objects.index_versions(versions)
+
+post_revision_commit.connect(index_revision_versions)
+
+
+class FieldModelDescriptor(object):
+    # What containers need to know about a field model, computed once per
+    # field model instead of by instantiating it on every call.
+    def __init__(self, field_model):
+        self.field_model = field_model
+        self.refresh()
+
+    def refresh(self):
+        # The model decorators set their flags after class_prepared, so they
+        # call this again once they have run.
+        field_model = self.field_model
+        self.sourced = hasattr(field_model, 'sourced')
+        self.source_required = getattr(field_model, 'source_required', False)
+        self.translated = hasattr(field_model, 'translated')
+        self.versioned = hasattr(field_model, 'versioned')
+
+    @property
+    def field_name(self):
+        return getattr(self.field_model, 'field_name', 'No field model')
+
+    @cached_property
+    def value_field(self):
+        return self.field_model._meta.get_field('value')
+
+    @cached_property
+    def value_internal_type(self):
+        return self.value_field.get_internal_type().strip()
+
+    @cached_property
+    def fk_model(self):
+        if isinstance(self.value_field, models.ForeignKey):
+            return self.value_field.remote_field.model
+        return None
+
+
+field_model_descriptors = {}
+
+
+def get_field_model_descriptor(field_model):
+    try:
+        return field_model_descriptors[field_model]
+    except KeyError:
+        descriptor = FieldModelDescriptor(field_model)
+        field_model_descriptors[field_model] = descriptor
+        return descriptor
+
+
+def register_field_model(sender, **kwargs):
+    if issubclass(sender, ComplexField):
+        get_field_model_descriptor(sender)
+
+class_prepared.connect(register_field_model)
+
+
+def get_lookup_index_fields(field_model):
+    # The columns the lookups of the containers filter and order on, as
+    # reported by check_complex_field_indexes. ComplexField.Meta declares
+    # the first index, field models add the one on their value to their
+    # Meta. Text and geometry values are left out, most databases can't
+    # index them with a plain btree.
+    index_fields = [('object_ref', 'lang')]
+
+    value_field = field_model._meta.get_field('value')
+    if (value_field.get_internal_type() not in ('TextField', 'BinaryField') and
+            getattr(value_field, 'geom_type', None) is None):
+        index_fields.append(('object_ref', 'value'))
+
+    return index_fields
+
+
+class FieldValidationError(namedtuple('FieldValidationError', ['code', 'message'])):
+    # A validation error of a complex field, its str() is the message.
+    __slots__ = ()
+
+    def __str__(self):
+        return self.message
+
+
+class FieldValidator(object):
+    # Validates and adapts the submitted values of one field model. Only
+    # ForeignKey values need the database, through the resolver.
+    def __init__(self, field_model):
+        self.descriptor = get_field_model_descriptor(field_model)
+
+    def validate(self, value, sources={}, resolver=None):
+        if self.descriptor.sourced and value != "":
+            if not len(sources['sources']) :
+                return (FieldValidationError('sources_required',
+                                   "sources are required to update this field"), value)
+            elif sources['confidence'] == 0 :
+                return (FieldValidationError('confidence_required',
+                                   "A confidence must be set for this field"), value)
+
+        (value, error) = self.adapt_value(value, resolver=resolver)
+        if error is not None:
+            error = FieldValidationError('invalid', error)
+        return (error, value)
+
+    def adapt_value(self, value, resolver=None):
+        internal_type = self.descriptor.value_internal_type
+
+        if internal_type == "BooleanField":
+            if value.strip() == "False" or value == "":
+                return (False, None)
+            elif value.strip() == "True":
+                return (True, None)
+            else:
+                return (None, "Invalid value for this field")
+        elif internal_type == "ForeignKey":
+            if value == "":
+                return (None, None)
+
+            if resolver is None:
+                resolver = ForeignKeyResolver()
+            value = resolver.get(self.descriptor.fk_model, value)
+
+            #return (object_, None)
+            return (value, None)
+
+        elif internal_type == "IntegerField":
+            if value.strip() == "":
+                return (0, None)
+
+        return (value, None)
+
+
+field_validators = {}
+
+
+def get_field_validator(field_model):
+    try:
+        return field_validators[field_model]
+    except KeyError:
+        validator = FieldValidator(field_model)
+        field_validators[field_model] = validator
+        return validator
+
+
+class ForeignKeyValueCache(object):
+    # Process wide LRU of value -> pk for one FK model, sized by
+    # COMPLEX_FIELDS_FK_CACHE_SIZE (0, the default, disables it).
+    def __init__(self, size):
+        self.size = size
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, value):
+        with self.lock:
+            try:
+                pk = self.values.pop(value)
+            except KeyError:
+                return None
+            self.values[value] = pk
+            return pk
+
+    def set(self, value, pk):
+        with self.lock:
+            self.values.pop(value, None)
+            self.values[value] = pk
+            while len(self.values) > self.size:
+                self.values.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+fk_value_caches = {}
+
+
+def get_fk_value_cache(fk_model):
+    size = getattr(settings, 'COMPLEX_FIELDS_FK_CACHE_SIZE', 0)
+    if not size:
+        return None
+
+    cache = fk_value_caches.get(fk_model)
+    if cache is None:
+        cache = fk_value_caches.setdefault(fk_model, ForeignKeyValueCache(size))
+    return cache
+
+
+def clear_fk_value_cache(sender, **kwargs):
+    cache = fk_value_caches.get(sender)
+    if cache is not None:
+        cache.clear()
+
+post_delete.connect(clear_fk_value_cache)
+
+
+# Process wide map of ISO 639-1 code -> (name_en, name_native), loaded
+# the first time a language name is needed and dropped whenever a
+# Language is saved or deleted.
+language_names = None
+
+
+def get_language_names():
+    global language_names
+    names = language_names
+    if names is None:
+        names = {}
+        for iso, name_en, name_native in Language.objects.values_list(
+                'iso_639_1', 'name_en', 'name_native').order_by('pk'):
+            names.setdefault(iso, (name_en, name_native))
+        language_names = names
+    return names
+
+
+def clear_language_names(sender, **kwargs):
+    global language_names
+    language_names = None
+
+post_save.connect(clear_language_names, sender=Language)
+post_delete.connect(clear_language_names, sender=Language)
+
+
+class ForeignKeyResolver(object):
+    # Resolves the values of ForeignKey value fields for a batch of
+    # validations. Values are collected with add() first, then resolved
+    # the first time one of them is needed: one query fetches the existing
+    # values of each FK model and one bulk insert creates the missing ones.
+    # Inserts tolerate rows created concurrently by another writer.
+    def __init__(self):
+        self.pending = {}
+        self.resolved = {}
+
+    def add(self, fk_model, value):
+        if value == "" or value in self.resolved.get(fk_model, {}):
+            return
+        self.pending.setdefault(fk_model, set()).add(value)
+
+    def resolve(self):
+        pending, self.pending = self.pending, {}
+        for fk_model, values in pending.items():
+            self.resolve_values(fk_model, values)
+
+    def resolve_values(self, fk_model, values):
+        resolved = self.resolved.setdefault(fk_model, {})
+        cache = get_fk_value_cache(fk_model)
+
+        values = set(value for value in values if value not in resolved)
+        if cache is not None:
+            for value in list(values):
+                pk = cache.get(value)
+                if pk is not None:
+                    resolved[value] = fk_model.from_db(
+                        router.db_for_read(fk_model),
+                        [fk_model._meta.pk.attname, 'value'], [pk, value]
+                    )
+                    values.discard(value)
+
+        if not values:
+            return
+
+        self.fetch(fk_model, values)
+
+        missing = [value for value in values if value not in resolved]
+        if missing:
+            self.create(fk_model, missing)
+            self.fetch(fk_model, missing)
+
+        # Only reached when the FK model does not accept the value as is
+        # (for instance a value normalized on save).
+        for value in values:
+            if value not in resolved:
+                resolved[value], created = fk_model.objects.get_or_create(value=value)
+
+        if cache is not None:
+            for value in values:
+                cache.set(value, resolved[value].pk)
+
+    def fetch(self, fk_model, values):
+        resolved = self.resolved[fk_model]
+        for instance in fk_model.objects.filter(value__in=values).order_by('pk'):
+            if instance.value in values:
+                resolved.setdefault(instance.value, instance)
+
+    def create(self, fk_model, values):
+        instances = [fk_model(value=value) for value in values]
+        database = router.db_for_write(fk_model)
+
+        if getattr(connections[database].features, 'supports_ignore_conflicts', False):
+            fk_model.objects.bulk_create(instances, ignore_conflicts=True)
+            return
+
+        try:
+            with transaction.atomic(using=database):
+                fk_model.objects.bulk_create(instances)
+        except IntegrityError:
+            # Another writer created some of these values since they were
+            # fetched, create the others one by one.
+            for value in values:
+                try:
+                    with transaction.atomic(using=database):
+                        fk_model.objects.get_or_create(value=value)
+                except IntegrityError:
+                    pass
+
+    def get(self, fk_model, value):
+        if value not in self.resolved.get(fk_model, {}):
+            self.add(fk_model, value)
+            self.resolve()
+
+        return self.resolved[fk_model][value]
+
+
+def get_language_chain(lang):
+    # The requested language followed by the deployment's fallback
+    # languages, in the order they should be tried.
+    chain = [lang]
+    for fallback in getattr(settings, 'COMPLEX_FIELDS_FALLBACK_LANGUAGES', ['en']):
+        if fallback not in chain:
+            chain.append(fallback)
+    return chain
+
+
+def fallback_to_any_language():
+    return getattr(settings, 'COMPLEX_FIELDS_FALLBACK_TO_ANY_LANGUAGE', True)
+
+
+def snapshots_enabled():
+    return getattr(settings, 'COMPLEX_FIELDS_SNAPSHOTS', False)
+
+
+def get_object_model(field_model):
+    return field_model._meta.get_field('object_ref').remote_field.model
+
+
+def get_through(field_model, m2m_name):
+    # The through model of one of the field model's many to many fields,
+    # with the attribute names of its columns pointing to the field row
+    # and to the related object.
+    m2m_field = field_model._meta.get_field(m2m_name)
+    through = m2m_field.remote_field.through
+    from_attname = through._meta.get_field(m2m_field.m2m_field_name()).attname
+    to_attname = through._meta.get_field(m2m_field.m2m_reverse_field_name()).attname
+    return (through, from_attname, to_attname)
+
+
+def set_field_sources(field_model, field_ids, accesspoints, clear_sources=False):
+    # Replace the access points of the given rows and add the sources of
+    # those access points, with one delete and one insert per through
+    # table whatever the number of rows and access points.
+    field_ids = list(field_ids)
+    if not field_ids:
+        return
+
+    accesspoints = list(accesspoints)
+
+    through, from_attname, to_attname = get_through(field_model, 'accesspoints')
+    through.objects.filter(**{from_attname + '__in': field_ids}).delete()
+    through.objects.bulk_create([
+        through(**{from_attname: field_id, to_attname: accesspoint.pk})
+        for field_id in field_ids
+        for accesspoint in accesspoints
+    ])
+
+    source_ids = set(accesspoint.source_id for accesspoint in accesspoints)
+
+    through, from_attname, to_attname = get_through(field_model, 'sources')
+    existing = through.objects.filter(**{from_attname + '__in': field_ids})
+    if clear_sources:
+        existing.delete()
+        existing = set()
+    else:
+        existing = set(existing.filter(**{to_attname + '__in': source_ids})
+                               .values_list(from_attname, to_attname))
+
+    through.objects.bulk_create([
+        through(**{from_attname: field_id, to_attname: source_id})
+        for field_id in field_ids
+        for source_id in source_ids
+        if (field_id, source_id) not in existing
+    ])
+
+
+def record_versions(field_model, rows):
+    # Versions are serialized when a row is saved, so the rows saved before
+    # their sources could be written are added to the active revision
+    # again once they are.
+    if get_field_model_descriptor(field_model).versioned and reversion.is_active():
+        for row in rows:
+            reversion.add_to_revision(row)
+
+
+def copy_field_sources(field_model, field_ids, to_field_id):
+    # Give the row to_field_id the sources and access points of the first
+    # of field_ids that has sources, keeping the ones it already has.
+    through, from_attname, to_attname = get_through(field_model, 'sources')
+    links = through.objects.filter(
+        **{from_attname + '__in': list(field_ids) + [to_field_id]}
+    ).values_list(from_attname, to_attname)
+
+    source_ids = {}
+    for field_id, source_id in links:
+        source_ids.setdefault(field_id, set()).add(source_id)
+
+    from_field_ids = [field_id for field_id in field_ids if field_id in source_ids]
+    if not from_field_ids:
+        return
+
+    from_field_id = from_field_ids[0]
+    existing = source_ids.get(to_field_id, set())
+    through.objects.bulk_create([
+        through(**{from_attname: to_field_id, to_attname: source_id})
+        for source_id in source_ids[from_field_id] - existing
+    ])
+
+    through, from_attname, to_attname = get_through(field_model, 'accesspoints')
+    accesspoint_ids = get_accesspoint_ids(field_model, [from_field_id, to_field_id])
+    existing = accesspoint_ids.get(to_field_id, set())
+    through.objects.bulk_create([
+        through(**{from_attname: to_field_id, to_attname: accesspoint_id})
+        for accesspoint_id in accesspoint_ids.get(from_field_id, set()) - existing
+    ])
+
+
+def get_accesspoint_ids(field_model, field_ids):
+    # Map of the given row ids to the set of their access point ids, read
+    # from the through table in one query.
+    through, from_attname, to_attname = get_through(field_model, 'accesspoints')
+    accesspoint_ids = {}
+    links = through.objects.filter(**{from_attname + '__in': list(field_ids)})
+    for field_id, accesspoint_id in links.values_list(from_attname, to_attname):
+        accesspoint_ids.setdefault(field_id, set()).add(accesspoint_id)
+    return accesspoint_ids
+
+
+def bulk_create_rows(field_model, rows):
+    # Insert rows and return them with their primary keys, in one query on
+    # databases returning the ids of bulk inserts and one per row elsewhere.
+    database = router.db_for_write(field_model)
+    features = connections[database].features
+    if getattr(features, 'can_return_rows_from_bulk_insert',
+               getattr(features, 'can_return_ids_from_bulk_insert', False)):
+        return field_model.objects.bulk_create(rows)
+
+    for row in rows:
+        row.save()
+    return rows
+
+
+def get_prefetched_rows(table_object, field_model, lang=None):
+    # Rows are stored under (field_model, None) when every language was
+    # loaded and under (field_model, lang) when only the rows needed to
+    # answer for lang were loaded.
+    rows = find_prefetched_rows(table_object, field_model, lang)
+    if rows is None and load_snapshot(table_object, lang):
+        rows = find_prefetched_rows(table_object, field_model, lang)
+    return rows
+
+
+def find_prefetched_rows(table_object, field_model, lang=None):
+    rows = getattr(table_object, '_complex_field_rows', None)
+    if not rows:
+        return None
+
+    if (field_model, None) in rows:
+        return rows[(field_model, None)]
+
+    if lang is not None:
+        return rows.get((field_model, lang))
+
+    return None
+
+
+def run_sync(func, *args):
+    # asgiref comes with Django 3.0 and later, which the async API needs.
+    from asgiref.sync import sync_to_async
+    return sync_to_async(func)(*args)
+
+
+def load_snapshot(table_object, lang=None):
+    # Fill the prefetched rows of a saved object from its snapshot, once
+    # per language, when snapshots are enabled and none of its fields was
+    # written through it.
+    if (not snapshots_enabled() or table_object.pk is None or
+            table_object.__dict__.get('_complex_field_written', False)):
+        return False
+
+    lang = lang or get_language()
+    if lang in table_object.__dict__.get('_complex_field_snapshot_langs', ()):
+        return False
+
+    from complex_fields.snapshots import load_snapshots
+    load_snapshots([table_object], lang)
+    return True
+
+
+def forget_prefetched_rows(table_object, field_model):
+    # Called by the writes to the rows of field_model. Snapshots are only
+    # rebuilt on commit, so the object stops loading them: they would hold
+    # the rows of before the write.
+    table_object.__dict__['_complex_field_written'] = True
+
+    rows = getattr(table_object, '_complex_field_rows', None)
+    if rows:
+        for key in [key for key in rows if key[0] == field_model]:
+            del rows[key]
+
+
+class ContainerMetadata(object):
+    # What the containers of one field model on one table model have in
+    # common, computed once per pair and shared by all of them.
+    __slots__ = ('field_model', 'descriptor', 'field_str_id', 'attr_name',
+                 'object_name')
+
+    def __init__(self, table_class, field_model):
+        table_name = table_class.__name__
+        self.field_model = field_model
+        self.descriptor = get_field_model_descriptor(field_model)
+        self.field_str_id = table_name + "_" + field_model.__name__
+        self.attr_name = re.sub(table_name, '', field_model.__name__).lower()
+        self.object_name = table_name.lower()
+
+
+container_metadata = {}
+
+
+def get_container_metadata(table_class, field_model):
+    try:
+        return container_metadata[(table_class, field_model)]
+    except KeyError:
+        metadata = ContainerMetadata(table_class, field_model)
+        container_metadata[(table_class, field_model)] = metadata
+        return metadata
+
+
 class ComplexFieldContainer(object):
-    def __init__(self, table_object, field_model, id_=None):
+    __slots__ = ('table_object', 'metadata', 'id_', '_field')
+
+    def __init__(self, table_object, field_model, id_=None, field=None):
         self.table_object = table_object
-        self.field_model = field_model
-        self.sourced = hasattr(field_model(), 'sourced')
-        self.translated = hasattr(field_model(), 'translated')
-        self.versioned = hasattr(field_model(), 'versioned')
+        self.metadata = get_container_metadata(table_object.__class__, field_model)
+
+        # Containers of list items can be bound to their already loaded row.
+        if id_ is None and field is not None:
+            id_ = field.pk
         self.id_ = id_
+        self._field = field
+
+    @property
+    def field_model(self):
+        return self.metadata.field_model
+
+    @property
+    def descriptor(self):
+        return self.metadata.descriptor
+
+    @property
+    def sourced(self):
+        return self.metadata.descriptor.sourced
+
+    @property
+    def translated(self):
+        return self.metadata.descriptor.translated
+
+    @property
+    def versioned(self):
+        return self.metadata.descriptor.versioned
 
     def __str__(self):
         value = self.get_value(get_language())
 
         if value is None:
-            value = self.get_value('en')
-            if value is None:
-                value = ""
+            value = ""
         return str(value)
 
     @property
     def field_name(self):
-        if self.id_ is None:
-            if not hasattr(self.field_model(),'field_name'):
-                return 'No field model'
-            return self.field_model().field_name
-
-        try:
-            field = self.field_model.objects.get(pk=self.id_)
-            return field.field_name
-        except self.field_model.DoesNotExist:
-            if not hasattr(self.field_model(),'field_name'):
-                return 'No field model'
-            return self.field_model().field_name
+        # field_name is a class attribute of the field models, read from the
+        # bound row when there is one.
+        if self._field is not None:
+            return self._field.field_name
+        return self.descriptor.field_name
 
     def get_attr_name(self):
-        table_name = self.table_object.__class__.__name__
-        return re.sub(table_name, '', self.field_model.__name__).lower()
+        return self.metadata.attr_name
 
     def get_object_id(self):
         if self.table_object.id:
@@ -109,47 +831,95 @@ class ComplexFieldContainer(object):
             return None
 
     def get_object_name(self):
-        return self.table_object.__class__.__name__.lower()
+        return self.metadata.object_name
 
     def get_field_str_id(self):
-        table_name = self.table_object.__class__.__name__
-        field_name = self.field_model.__name__
-        return table_name + "_" + field_name
+        return self.metadata.field_str_id
+
+    def get_prefetched_rows(self, lang=None):
+        return get_prefetched_rows(self.table_object, self.field_model, lang)
+
+    def forget_prefetched_rows(self):
+        forget_prefetched_rows(self.table_object, self.field_model)
+        self._field = None
 
-    def get_field(self, lang=get_language()):
+    @instrumented('get_field')
+    def get_field(self, lang=get_language(), fallback_any=None):
         if self.id_ == 0:
             return None
 
+        if fallback_any is None:
+            fallback_any = fallback_to_any_language()
+
+        if self._field is not None:
+            return self.get_field_from_rows([self._field], lang, fallback_any)
+
+        rows = self.get_prefetched_rows(lang)
+        if rows is not None:
+            return self.get_field_from_rows(rows, lang, fallback_any)
+
+        c_field = list(self.get_field_queryset(lang, fallback_any)[:1])
+
+        if c_field:
+            return c_field[0]
+
+        return None
+
+    def get_field_queryset(self, lang, fallback_any, chain=None):
+        # The rows get_field picks from, ordered so the one it returns comes
+        # first. chain defaults to the language chain of lang.
         c_fields = self.field_model.objects.filter(object_ref=self.table_object)
         if self.id_:
             c_fields = c_fields.filter(pk=self.id_)
 
         if self.translated:
-            c_fields_lang = c_fields.filter(lang=lang)
-            c_field = list(c_fields_lang[:1])
+            # Resolve the whole language chain in one query by ranking the
+            # rows on the position of their language in the chain.
+            if chain is None:
+                chain = get_language_chain(lang)
+            c_fields = c_fields.annotate(lang_rank=Case(
+                *[When(lang=code, then=Value(rank)) for rank, code in enumerate(chain)],
+                default=Value(len(chain)),
+                output_field=IntegerField()
+            ))
+
+            if not fallback_any:
+                c_fields = c_fields.filter(lang_rank__lt=len(chain))
+
+            c_fields = c_fields.order_by('lang_rank', 'pk')
+
+        return c_fields
 
-            if not c_field:
-                c_fields = c_fields.filter(lang='en')
-                c_field = list(c_fields[:1])
+    def get_field_from_rows(self, rows, lang, fallback_any=True):
+        if self.id_:
+            rows = [row for row in rows if str(row.pk) == str(self.id_)]
+
+        if self.translated:
+            chain = get_language_chain(lang)
+            ranked = []
+            for row in rows:
+                if row.lang in chain:
+                    ranked.append((chain.index(row.lang), row.pk, row))
+                elif fallback_any:
+                    ranked.append((len(chain), row.pk, row))
+
+            c_field = [row for rank, pk, row in sorted(ranked, key=lambda r: r[:2])]
         else:
-            c_field = list(c_fields[:1])
+            c_field = rows
 
         if c_field:
             return c_field[0]
 
         return None
 
+    @instrumented('get_value')
     def get_value(self, lang=get_language()):
-        field = self.get_field(lang)
-        if field is not None:
-            return field
-        else:
-            field = self.get_field('en')
-            if field is not None:
-                return field
-        return None
+        # get_field already falls back through the language chain.
+        return self.get_field(lang)
 
     def set_value(self, value, lang=get_language()):
+        self.forget_prefetched_rows()
+
         c_fields = self.field_model.objects.filter(object_ref=self.table_object)
         if self.translated:
             c_fields = c_fields.filter(lang=lang)
@@ -163,7 +933,7 @@ class ComplexFieldContainer(object):
             else:
                 field.lang = 'en'
 
-        if field._meta.get_field('value').get_internal_type() == "BooleanField":
+        if self.descriptor.value_internal_type == "BooleanField":
             if value == "False":
                 value = False
             elif value == "True":
@@ -173,23 +943,29 @@ class ComplexFieldContainer(object):
         field.save()
 
     def get_language_from_iso(self, iso):
-        try:
-            lang = Language.objects.get(iso_639_1=iso)
-        except Language.DoesNotExist:
+        names = get_language_names().get(iso)
+        if names is None:
             return "Unknown"
 
+        name_en, name_native = names
         if iso == get_language():
-            return lang.name_en
+            return name_en
         else:
-            return lang.name_en + ", " + lang.name_native
+            return name_en + ", " + name_native
 
+    @instrumented('get_translations')
     def get_translations(self):
         translations = []
-        if not hasattr(self.field_model, 'translated'):
+        if not self.translated:
             return translations
 
-        c_fields = self.field_model.objects.filter(object_ref=self.table_object)
-        c_fields = c_fields.exclude(value__isnull=True).exclude(value__exact='')
+        rows = self.get_prefetched_rows()
+        if rows is not None:
+            c_fields = [row for row in rows
+                        if row.value is not None and row.value != '']
+        else:
+            c_fields = self.field_model.objects.filter(object_ref=self.table_object)
+            c_fields = c_fields.exclude(value__isnull=True).exclude(value__exact='')
 
         for field in c_fields:
             trans = {
@@ -200,19 +976,28 @@ class ComplexFieldContainer(object):
 
         return translations
 
+    def get_accesspoint_links(self):
+        # The through rows linking every row of this field to its access
+        # points, as a queryset of access point ids.
+        through, from_attname, to_attname = get_through(self.field_model, 'accesspoints')
+        c_fields = self.field_model.objects.filter(object_ref=self.table_object)
+        return through.objects.filter(
+            **{from_attname + '__in': c_fields.values('pk')}
+        ).values_list(to_attname, flat=True)
+
+    def get_source_ids(self):
+        if not self.sourced:
+            return set()
+        return set(self.get_accesspoint_links())
+
+    @instrumented('get_sources')
     def get_sources(self):
 
         sources = []
         if not self.sourced:
             return sources
 
-        c_fields = self.field_model.objects.filter(object_ref=self.table_object)
-
-        source_ids = []
-        for field in c_fields:
-            source_ids.extend([s.uuid for s in field.accesspoints.all()])
-
-        return AccessPoint.objects.filter(uuid__in=source_ids)
+        return AccessPoint.objects.filter(pk__in=self.get_accesspoint_links())
 
     def get_confidence(self):
         field = self.get_field()
@@ -220,29 +1005,85 @@ class ComplexFieldContainer(object):
             return '1'
         return field.confidence
 
+    # Async counterparts of the read methods, running them in the thread
+    # Django uses for the ORM in async code. lang defaults to the language
+    # active when they are called.
+
+    async def aget_field(self, lang=None, fallback_any=None):
+        if lang is None:
+            lang = get_language()
+        return await run_sync(self.get_field, lang, fallback_any)
+
+    async def aget_value(self, lang=None):
+        if lang is None:
+            lang = get_language()
+        return await run_sync(self.get_value, lang)
+
+    async def aget_translations(self):
+        return await run_sync(self.get_translations)
+
+    async def aget_sources(self):
+        return await run_sync(lambda: list(self.get_sources()))
+
+    @instrumented('update')
+    @transaction.atomic
     def update(self, value, lang, sources={}):
-        if not self.translated:
-            c_field = self.get_field(lang)
+        # The row is read again from the database, locked where supported,
+        # since prefetched, snapshot or cached rows may be stale and the
+        # write is skipped when the value equals theirs.
+        self.forget_prefetched_rows()
+
+        if self.id_ == 0:
+            c_field = None
         else:
-            c_field = self.get_field(None)
+            if not self.translated:
+                c_fields = self.get_field_queryset(lang, fallback_to_any_language())
+            else:
+                # The row written is the one without a language, or else the
+                # English one, whatever the fallback languages of the reads.
+                c_fields = self.get_field_queryset(None, False, chain=[None, 'en'])
 
-        if c_field:
-            if getattr(c_field, 'source_required', False):
-                c_field.accesspoints.set(sources['sources'], clear=True)
-                for accesspoint in sources['sources']:
-                    c_field.sources.add(accesspoint.source)
+            database = router.db_for_write(self.field_model)
+            c_fields = c_fields.using(database)
+            if connections[database].features.has_select_for_update:
+                c_fields = c_fields.select_for_update()
+
+            c_field = list(c_fields[:1])
+            c_field = c_field[0] if c_field else None
 
+        if c_field:
+            if self.descriptor.source_required:
                 c_field.confidence = sources['confidence']
 
             if self.translated:
                 c_field.lang = lang
 
             c_field.value = value
-            c_field.save()
+
+            # Only write what changed, an unchanged field is neither saved
+            # nor versioned again. The sources are written first so the
+            # version recorded on save holds them.
+            sources_changed = (
+                self.descriptor.source_required and
+                get_accesspoint_ids(self.field_model, [c_field.pk]).get(c_field.pk, set()) !=
+                set(accesspoint.pk for accesspoint in sources['sources'])
+            )
+
+            if sources_changed:
+                set_field_sources(self.field_model, [c_field.pk], sources['sources'])
+
+            dirty_fields = c_field.get_dirty_fields()
+            if dirty_fields is None or sources_changed:
+                c_field.save()
+            elif dirty_fields:
+                c_field.save(update_fields=dirty_fields)
         else:
             self.update_new(value, lang, sources=sources)
 
+    @transaction.atomic
     def update_new(self, value, lang, sources={}):
+        self.forget_prefetched_rows()
+
         if self.translated:
             c_field = self.field_model(object_ref=self.table_object, lang=lang)
         else:
@@ -253,76 +1094,80 @@ class ComplexFieldContainer(object):
         if self.translated:
             c_field.lang = lang
 
-        c_field.save()
-
-        if getattr(c_field, 'source_required',  False):
+        if self.descriptor.source_required:
             c_field.confidence = sources['confidence']
-            c_field.accesspoints.set(sources['sources'], clear=True)
 
-            for accesspoint in sources['sources']:
-                c_field.sources.add(accesspoint.source)
+        c_field.save()
 
-            c_field.save()
+        if self.descriptor.source_required:
+            set_field_sources(self.field_model, [c_field.pk], sources['sources'])
+            record_versions(self.field_model, [c_field])
 
-    def adapt_value(self, value):
-        c_field = self.field_model()
-        internal_type = c_field._meta.get_field('value').get_internal_type()
+    def adapt_value(self, value, resolver=None):
+        return get_field_validator(self.field_model).adapt_value(value, resolver)
 
-        if internal_type.strip() == "BooleanField":
-            if value.strip() == "False" or value == "":
-                return (False, None)
-            elif value.strip() == "True":
-                return (True, None)
-            else:
-                return (None, "Invalid value for this field")
-        elif internal_type.strip() == "ForeignKey":
-            if value == "":
-                return (None, None)
+    @transaction.atomic
+    def update_translations(self, value, lang, sources):
+        self.forget_prefetched_rows()
 
-            fk_model = self.get_fk_model()
-            value, created = fk_model.objects.get_or_create(value=value)
+        c_fields = self.field_model.objects.filter(object_ref=self.table_object)
 
-            #return (object_, None)
-            return (value, None)
+        # Compare the sources once, before any row is changed.
+        same_sources = not self.sourced or self.has_same_sources(sources)
 
-        elif internal_type.strip() == "IntegerField":
-            if value.strip() == "":
-                return (0, None)
+        # Set translation values to None if the value is changed or False
+        # if it's a boolean
+        if self.descriptor.value_internal_type == "BooleanField":
+            cleared = False
+        else:
+            cleared = None
 
-        return (value, None)
+        # The row in lang is written by the caller. The others are updated
+        # here without save(), so complex_fields_bulk_updated is sent when
+        # any of them changed.
+        translations = c_fields.exclude(lang=lang)
+        updated = 0
 
-    def update_translations(self, value, lang, sources):
-        c_fields = self.field_model.objects.filter(object_ref=self.table_object)
+        # Update sources for all translations if they are not the same. They
+        # are written first, so the versions saved below hold them.
         sources_updated = False
-
-        for field in c_fields:
-            # Set translation values to None if the value is changed or False
-            # if it's a boolean
-            if field is None or field.value != value:
-                field.value = None
-
-            # Update sources for all translations if they are not the same
-            if self.sourced and not self.has_same_sources(sources):
+        if not same_sources:
+            field_ids = list(c_fields.values_list('pk', flat=True))
+            if field_ids:
+                set_field_sources(self.field_model, field_ids, sources['sources'],
+                                  clear_sources=True)
                 sources_updated = True
-                field.sources.clear()
-                for accesspoint in sources['sources']:
-                    field.accesspoints.add(accesspoint)
-                    field.source.add(accesspoint.source)
-                field.confidence = sources['confidence']
 
-            if field.lang != lang:
-                field.save()
+        if self.versioned and reversion.is_active():
+            # Versions of the translations are only recorded on save.
+            for field in translations:
+                if field.value != value or not same_sources:
+                    if field.value != value:
+                        field.value = cleared
+                    if not same_sources:
+                        field.confidence = sources['confidence']
+                    field.save()
+        else:
+            updated += translations.exclude(value=value).update(value=cleared)
+            if not same_sources:
+                updated += translations.update(confidence=sources['confidence'])
 
+        if updated or sources_updated:
+            complex_fields_bulk_updated.send(sender=self.field_model,
+                                             object_ids=[self.table_object.id])
         return sources_updated
 
+    @instrumented('translate')
+    @transaction.atomic
     def translate(self, value, lang):
-        c_fields = self.field_model.objects.filter(object_ref=self.table_object)
+        self.forget_prefetched_rows()
 
-        if not c_fields.exists():
+        c_fields = list(self.field_model.objects.filter(object_ref=self.table_object))
+
+        if not c_fields:
             raise FieldDoesNotExist("Can't translate a field that doesn't exist")
 
-        c_field = c_fields.filter(lang=lang)
-        c_field = list(c_field[:1])
+        c_field = [field for field in c_fields if field.lang == lang]
         if not c_field:
             c_field = self.field_model(object_ref=self.table_object, lang=lang)
         else:
@@ -333,66 +1178,55 @@ class ComplexFieldContainer(object):
         c_field.value = value
         c_field.save()
 
-        if hasattr(c_field, 'sourced'):
-            with_sources = c_fields.exclude(sources=None)
-            sources = with_sources[0].sources.all()
-            for src in sources:
-                c_field.sources.add(src)
-
-        c_field.save()
-
-    def validate(self, value, lang, sources={}):
-
-        if (hasattr(self.field_model(), "source_required") and
-            value != ""):
-            if not len(sources['sources']) :
-                return ("sources are required to update this field", value)
-            elif sources['confidence'] == 0 :
-                return ("A confidence must be set for this field", value)
-
+        if self.sourced:
+            copy_field_sources(
+                self.field_model,
+                [field.pk for field in c_fields if field.pk != c_field.pk],
+                c_field.pk
+            )
+            # The version saved above was recorded without the copied sources.
+            record_versions(self.field_model, [c_field])
 
-        (value, error) = self.adapt_value(value)
+    def validate(self, value, lang, sources={}, resolver=None):
+        (error, value) = get_field_validator(self.field_model).validate(
+            value, sources, resolver=resolver
+        )
+        if error is not None:
+            error = error.message
         return (error, value)
 
     def get_fk_model(self, field_name="value"):
-        field_object, model, direct, m2m = (
-            self.field_model._meta.get_field_by_name(field_name)
-        )
-        if not m2m and direct and isinstance(field_object, models.ForeignKey):
-            return field_object.rel.to
+        if field_name == "value":
+            return self.descriptor.fk_model
+
+        field_object = self.field_model._meta.get_field(field_name)
+        if isinstance(field_object, models.ForeignKey):
+            return field_object.remote_field.model
         return None
 
 
-    def has_same_sources(self, sources):
-        if not self.get_confidence() == sources['confidence']:
+    def has_same_sources(self, sources, source_ids=None):
+        # source_ids can be passed when the saved access point ids are
+        # already known, to compare several times without querying again.
+        if not str(self.get_confidence()) == str(sources['confidence']):
             return False
 
-        sources = [
-            {"source": src}
-            for src in sources['sources']
-        ]
+        if source_ids is None:
+            source_ids = self.get_source_ids()
 
-        saved_sources = []
-        for src in self.get_sources():
-            saved_src = {}
-            saved_src['source'] = src
-            saved_sources.append(saved_src)
-        pairs = zip(saved_sources, sources)
-        if len(saved_sources) != len(sources) or any(x != y for x, y in pairs):
-            return False
-        return True
+        return source_ids == set(src.pk for src in sources['sources'])
 
     @classmethod
     def field_from_str_and_id(cls, object_name, object_id, field_name, field_id=None):
-        object_class = class_for_name(
-            object_name.capitalize(),
-            object_name + ".models"
-        )
+        # Imported here, complex_fields.cache imports this module.
+        from complex_fields.cache import get_object
+
+        object_class = get_object_class(object_name)
 
         if object_id == '0':
             object_ = object_class()
         else:
-            object_ = object_class.from_id(object_id)
+            object_ = get_object(object_class, object_id)
         field = getattr(object_, field_name)
 
         if isinstance(field, ComplexFieldListContainer):
@@ -402,23 +1236,132 @@ class ComplexFieldContainer(object):
         return field
 
 
+@functools.lru_cache(maxsize=None)
+def get_object_class(object_name):
+    return class_for_name(object_name.capitalize(), object_name + ".models")
+
+
+class ComplexFieldList(object):
+    # The items of a complex list, as containers bound to their rows. Rows
+    # are loaded on first iteration, len() or truth test and then kept;
+    # slicing a list that isn't loaded yet only loads the slice, and
+    # iterator() streams the rows in chunks without keeping them.
+    __slots__ = ('list_container', '_rows', '_queryset')
+
+    def __init__(self, list_container, rows=None, queryset=None):
+        self.list_container = list_container
+        self._rows = rows
+        self._queryset = queryset
+
+    @property
+    def field_model(self):
+        return self.list_container.field_model
+
+    def get_queryset(self):
+        if self._queryset is not None:
+            return self._queryset
+
+        return self.list_container.field_model.objects.filter(
+            object_ref=self.list_container.table_object
+        ).order_by('value', 'pk')
+
+    def bind(self, row):
+        return ComplexFieldContainer(self.list_container.table_object,
+                                     self.list_container.field_model,
+                                     field=row)
+
+    @instrumented('get_list')
+    def fetch(self, rows):
+        # Where the rows of the list are read, so the records of get_list
+        # count their queries.
+        return list(rows)
+
+    def get_rows(self):
+        if self._rows is None:
+            self._rows = self.fetch(self.get_queryset())
+        return self._rows
+
+    def __iter__(self):
+        for row in self.get_rows():
+            yield self.bind(row)
+
+    def __len__(self):
+        return len(self.get_rows())
+
+    def __bool__(self):
+        return bool(self.get_rows())
+
+    def __getitem__(self, index):
+        # Querysets don't take negative indexes, the rows are loaded for
+        # them.
+        if isinstance(index, slice):
+            negative = any(bound is not None and bound < 0
+                           for bound in (index.start, index.stop))
+        else:
+            negative = index < 0
+        if negative:
+            self.get_rows()
+
+        if self._rows is not None:
+            if isinstance(index, slice):
+                return ComplexFieldList(self.list_container, rows=self._rows[index])
+            return self.bind(self._rows[index])
+
+        if isinstance(index, slice):
+            return ComplexFieldList(self.list_container,
+                                    queryset=self.get_queryset()[index])
+        return self.bind(self.fetch(self.get_queryset()[index:index + 1])[0])
+
+    def count(self):
+        if self._rows is not None:
+            return len(self._rows)
+        return self.get_queryset().count()
+
+    def iterator(self, chunk_size=2000):
+        if self._rows is not None:
+            for row in self._rows:
+                yield self.bind(row)
+            return
+
+        rows = self.get_queryset().iterator(chunk_size=chunk_size)
+        while True:
+            chunk = self.fetch(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            for row in chunk:
+                yield self.bind(row)
+
+
 class ComplexFieldListContainer(object):
+    __slots__ = ('table_object', 'metadata')
+
     def __init__(self, table_object, field_model):
         self.table_object = table_object
-        self.field_model = field_model
+        self.metadata = get_container_metadata(table_object.__class__, field_model)
+
+    @property
+    def field_model(self):
+        return self.metadata.field_model
+
+    @property
+    def descriptor(self):
+        return self.metadata.descriptor
+
+    @property
+    def field_name(self):
+        return self.descriptor.field_name
 
     def get_list(self):
-        complex_fields = []
-        try:
-            fields = self.field_model.objects.filter(object_ref=self.table_object).order_by("value")
-        except self.field_model.DoesNotExist:
-            return []
-        for field in fields:
-            complex_fields.append(
-                ComplexFieldContainer(self.table_object, self.field_model, field.id)
-            )
+        return ComplexFieldList(
+            self, rows=get_prefetched_rows(self.table_object, self.field_model)
+        )
 
-        return complex_fields
+    async def aget_list(self):
+        return await run_sync(lambda: list(self.get_list()))
+
+    async def __aiter__(self):
+        for field in await self.aget_list():
+            yield field
 
     def get_complex_field(self, id_):
         try:
@@ -428,6 +1371,7 @@ class ComplexFieldListContainer(object):
             return None
 
     def get_field_str_id(self):
-        table_name = self.table_object.__class__.__name__
-        field_name = self.field_model.__name__
-        return table_name + "_" + field_name
+        return self.metadata.field_str_id
+
+    def forget_prefetched_rows(self):
+        forget_prefetched_rows(self.table_object, self.field_model)
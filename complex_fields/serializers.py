@@ -0,0 +1,50 @@
+from django.db import router
+
+from complex_fields.models import get_field_model_descriptor
+
+
+# Complex field rows as plain dicts of strings, shared by the snapshots and
+# the exporter. Importing this module connects no signal receivers.
+
+
+def serialize_row(row, source_ids=None):
+    # source_ids is left out of snapshots, the containers read the sources
+    # of a field from its through tables.
+    value_field = get_field_model_descriptor(row.__class__).value_field
+    value = getattr(row, value_field.attname)
+    if value is not None:
+        value = value_field.value_to_string(row)
+
+    data = {
+        'id': row._meta.pk.value_to_string(row),
+        'lang': row.lang,
+        'value': value,
+        'confidence': row.confidence,
+    }
+    if source_ids is not None:
+        data['sources'] = sorted(str(source_id) for source_id in source_ids)
+    return data
+
+
+def deserialize_row(field_model, data, table_object):
+    value_field = get_field_model_descriptor(field_model).value_field
+    value = data['value']
+    if value is not None:
+        value = value_field.to_python(value)
+
+    values = {
+        field_model._meta.pk.attname: field_model._meta.pk.to_python(data['id']),
+        'object_ref_id': table_object.pk,
+        'lang': data['lang'],
+        'confidence': data['confidence'],
+        value_field.attname: value,
+    }
+
+    # The other columns are deferred, so saving the row only writes the
+    # ones above and reading the others loads them.
+    field_names = [field.attname for field in field_model._meta.concrete_fields
+                   if field.attname in values]
+    row = field_model.from_db(router.db_for_read(field_model), field_names,
+                              [values[name] for name in field_names])
+    row.object_ref = table_object
+    return row
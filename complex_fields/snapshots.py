@@ -0,0 +1,174 @@
+import json
+import threading
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from complex_fields.base_models import (get_saved_object_ids, object_ref_saved,
+                                        prefetch_complex_fields)
+from complex_fields.models import (ComplexFieldSnapshot,
+                                   complex_fields_bulk_updated,
+                                   field_model_descriptors,
+                                   get_object_model, snapshots_enabled)
+from complex_fields.serializers import deserialize_row, serialize_row
+
+
+# Snapshots hold, for one object and one language, the row every complex
+# field resolves to in that language and every row of its complex lists.
+# Loading them for an object fills its prefetched rows, so its containers
+# and the template tags answer from one query. They are rebuilt when the
+# transaction writing to an object's complex fields commits.
+
+SNAPSHOT_BATCH_SIZE = 500
+
+
+def get_snapshot_languages():
+    return getattr(settings, 'COMPLEX_FIELDS_SNAPSHOT_LANGUAGES',
+                   [settings.LANGUAGE_CODE])
+
+
+def build_snapshots(objects):
+    # Snapshots of objects whose complex field rows were all prefetched.
+    languages = get_snapshot_languages()
+    snapshots = []
+
+    for object_ in objects:
+        content_type = ContentType.objects.get_for_model(object_)
+        lists = {}
+        for container in object_.complex_lists:
+            rows = object_._complex_field_rows[(container.field_model, None)]
+            lists[container.get_field_str_id()] = [serialize_row(row) for row in rows]
+
+        for lang in languages:
+            fields = {}
+            for container in object_.complex_fields:
+                row = container.get_field(lang)
+                fields[container.get_field_str_id()] = (
+                    serialize_row(row) if row is not None else None
+                )
+
+            snapshots.append(ComplexFieldSnapshot(
+                content_type=content_type,
+                object_id=str(object_.pk),
+                lang=lang,
+                data=json.dumps({'fields': fields, 'lists': lists}),
+            ))
+
+    return snapshots
+
+
+def rebuild_snapshots(model, object_ids):
+    object_ids = list(object_ids)
+    content_type = ContentType.objects.get_for_model(model)
+
+    for start in range(0, len(object_ids), SNAPSHOT_BATCH_SIZE):
+        batch = object_ids[start:start + SNAPSHOT_BATCH_SIZE]
+        objects = prefetch_complex_fields(model._default_manager.filter(pk__in=batch))
+
+        with transaction.atomic():
+            # Objects that were deleted only lose their snapshots.
+            ComplexFieldSnapshot.objects.filter(
+                content_type=content_type,
+                object_id__in=[str(object_id) for object_id in batch],
+            ).delete()
+
+            if objects:
+                ComplexFieldSnapshot.objects.bulk_create(build_snapshots(objects))
+
+
+def load_snapshots(objects, lang):
+    # Fill the prefetched rows of objects from their snapshots in lang.
+    # Objects without a snapshot keep reading from the field tables.
+    objects = [object_ for object_ in objects if object_.pk is not None]
+    if not objects:
+        return objects
+
+    content_type = ContentType.objects.get_for_model(objects[0])
+
+    snapshots = {}
+    for start in range(0, len(objects), SNAPSHOT_BATCH_SIZE):
+        batch = objects[start:start + SNAPSHOT_BATCH_SIZE]
+        for snapshot in ComplexFieldSnapshot.objects.filter(
+                content_type=content_type,
+                object_id__in=[str(object_.pk) for object_ in batch],
+                lang=lang):
+            snapshots[snapshot.object_id] = snapshot
+
+    for object_ in objects:
+        object_.__dict__.setdefault('_complex_field_snapshot_langs', set()).add(lang)
+
+        snapshot = snapshots.get(str(object_.pk))
+        if snapshot is None:
+            continue
+
+        data = json.loads(snapshot.data)
+        if getattr(object_, '_complex_field_rows', None) is None:
+            object_._complex_field_rows = {}
+        rows = object_._complex_field_rows
+
+        for container in object_.complex_fields:
+            field_str_id = container.get_field_str_id()
+            if field_str_id not in data['fields']:
+                continue
+
+            row = data['fields'][field_str_id]
+            rows.setdefault((container.field_model, lang), [
+                deserialize_row(container.field_model, row, object_)
+            ] if row is not None else [])
+
+        for container in object_.complex_lists:
+            field_str_id = container.get_field_str_id()
+            if field_str_id not in data['lists']:
+                continue
+
+            rows.setdefault((container.field_model, None), [
+                deserialize_row(container.field_model, row, object_)
+                for row in data['lists'][field_str_id]
+            ])
+
+    return objects
+
+
+_pending = threading.local()
+
+
+def schedule_rebuild(model, object_ids):
+    # Rebuild once the current transaction commits, once per object
+    # whatever the number of writes to its fields.
+    pending = getattr(_pending, 'objects', None)
+    if pending is None:
+        pending = _pending.objects = {}
+    pending.setdefault(model, set()).update(object_ids)
+
+    transaction.on_commit(flush_rebuilds)
+
+
+def flush_rebuilds():
+    pending = getattr(_pending, 'objects', None)
+    _pending.objects = {}
+    for model, object_ids in (pending or {}).items():
+        rebuild_snapshots(model, object_ids)
+
+
+def field_row_changed(sender, instance, **kwargs):
+    if sender in field_model_descriptors and snapshots_enabled():
+        schedule_rebuild(get_object_model(sender), [instance.object_ref_id])
+
+post_save.connect(field_row_changed)
+post_delete.connect(field_row_changed)
+
+
+def field_rows_changed(sender, object_ids, **kwargs):
+    if snapshots_enabled():
+        schedule_rebuild(get_object_model(sender), object_ids)
+
+complex_fields_bulk_updated.connect(field_rows_changed)
+
+
+def object_changed(sender, object_id, **kwargs):
+    if snapshots_enabled():
+        schedule_rebuild(sender, get_saved_object_ids(sender, object_id))
+
+object_ref_saved.connect(object_changed)
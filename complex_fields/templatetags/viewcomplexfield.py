@@ -1,6 +1,8 @@
+from django.db import models
 from django.template import Library
 from django_date_extensions.fields import ApproximateDate
 
+from complex_fields.cache import get_field_context
 from complex_fields.models import ComplexFieldListContainer
 
 register = Library()
@@ -13,17 +15,13 @@ def view_complex_field(field, object_id, path):
     if object_id is None:
         object_id = 0
 
-    value = field.get_value()
-    if (not isinstance(value, str) and not isinstance(value, int) and
-        value is not None and not isinstance(value, ApproximateDate)):
-        if hasattr(value, "get_value"):
-            value = value.get_value()
-        else:
-            value = value.value
+    context = get_field_context('view', field, field_context)
+    return dict(context, object_id=object_id, path=path)
+
 
+def field_context(field):
     return {
-        'value' : value,
-        'object_id': object_id,
+        'value' : field_value(field),
         'object_name': field.get_object_name(),
         'field_str_id': field.get_field_str_id(),
         'attr_name': field.get_attr_name(),
@@ -33,5 +31,21 @@ def view_complex_field(field, object_id, path):
         'versioned': field.versioned,
         'is_list': isinstance(field, ComplexFieldListContainer),
         'field_id': field.id_,
-        'path': path,
     }
+
+
+def field_value(field):
+    value = field.get_value()
+    if (not isinstance(value, str) and not isinstance(value, int) and
+        value is not None and not isinstance(value, ApproximateDate)):
+        if hasattr(value, "get_value"):
+            value = value.get_value()
+        else:
+            value = value.value
+
+    # Contexts are cached, a related object would be pickled with
+    # everything it references.
+    if isinstance(value, models.Model):
+        value = str(value)
+
+    return value
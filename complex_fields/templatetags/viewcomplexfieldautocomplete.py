@@ -1,6 +1,7 @@
 from django.template import Library
 from django_date_extensions.fields import ApproximateDate
 
+from complex_fields.cache import get_field_context
 from complex_fields.models import ComplexFieldListContainer
 
 register = Library()
@@ -12,6 +13,11 @@ def view_complex_field_autocomplete(field, object_id, source_url, path):
     if object_id is None:
         object_id = 0
 
+    context = get_field_context('view_autocomplete', field, field_context)
+    return dict(context, object_id=object_id, source_url=source_url, path=path)
+
+
+def field_context(field):
     value = field.get_value()
     if value is not None:
         value_id = value.id
@@ -24,7 +30,6 @@ def view_complex_field_autocomplete(field, object_id, source_url, path):
     return {
         'value' : value,
         'value_id': value_id,
-        'object_id': object_id,
         'object_name': field.get_object_name(),
         'field_str_id': field.get_field_str_id(),
         'attr_name': field.get_attr_name(),
@@ -34,6 +39,4 @@ def view_complex_field_autocomplete(field, object_id, source_url, path):
         'versioned': field.versioned,
         'is_list': isinstance(field, ComplexFieldListContainer),
         'field_id': field.id_,
-        'path': path,
-        'source_url': source_url,
     }
@@ -1,20 +1,29 @@
 from django.template import Library
 
+from complex_fields.cache import get_field_context
+
 register = Library()
 
 @register.inclusion_tag('view_boolean.html')
 def view_complex_field_boolean(field, object_id, path):
     if not field:
         return {}
-    field_id = field.get_field_str_id()
     if object_id is None:
         object_id = 0
+
+    context = get_field_context('view_boolean', field, field_context)
+    return dict(context, object_id=object_id, path=path)
+
+
+def field_context(field):
+    field_id = field.get_field_str_id()
     value = field.get_value()
     if value is None:
         value = False
+    else:
+        value = value.value
     return {
         'value' : value,
-        'object_id': object_id,
         'object_name': field.get_object_name(),
         'field_str_id': field.get_field_str_id(),
         'attr_name': field.get_attr_name(),
@@ -23,5 +32,4 @@ def view_complex_field_boolean(field, object_id, path):
         'sourced': field.sourced,
         'translated': field.translated,
         'versioned': field.versioned,
-        'path': path,
     }
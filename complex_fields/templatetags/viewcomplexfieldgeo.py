@@ -1,12 +1,20 @@
 from django.template import Library
 
+from complex_fields.cache import get_field_context
+
 register = Library()
 
 @register.inclusion_tag('view_geo.html')
 def view_complex_field_geo(field, object_id, geo_form, path):
-    field_id = field.get_field_str_id()
     if object_id is None:
         object_id = 0
+
+    context = get_field_context('view_geo', field, field_context)
+    return dict(context, object_id=object_id, geo_form=geo_form, path=path)
+
+
+def field_context(field):
+    field_id = field.get_field_str_id()
     value = field.get_value()
     if value is not None:
         value = value.value
@@ -15,7 +23,6 @@ def view_complex_field_geo(field, object_id, geo_form, path):
 
     return {
         'value' : value,
-        'object_id': object_id,
         'object_name': field.get_object_name(),
         'field_str_id': field.get_field_str_id(),
         'attr_name': field.get_attr_name(),
@@ -24,6 +31,4 @@ def view_complex_field_geo(field, object_id, geo_form, path):
         'sourced': field.sourced,
         'translated': field.translated,
         'versioned': field.versioned,
-        'path': path,
-        'geo_form': geo_form,
     }
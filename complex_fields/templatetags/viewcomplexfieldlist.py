@@ -1,28 +1,39 @@
 from django.template import Library
 from django_date_extensions.fields import ApproximateDate
 
+from complex_fields.cache import get_field_context
 from complex_fields.models import ComplexFieldListContainer
-from .viewcomplexfield import view_complex_field
+from .viewcomplexfield import field_value
 
 register = Library()
 
 @register.inclusion_tag('view_list.html')
 def view_complex_field_list(field_list, object_id, path):
-    
-    fields = {'field_list': []}
 
-    for field in field_list.get_list():
-        
-        field_info = view_complex_field(field, object_id, path)
+    if object_id is None:
+        object_id = 0
+
+    fields = dict(get_field_context('view_list', field_list, field_context))
+    fields['field_list'] = [
+        dict(item, object_id=object_id, path=path)
+        for item in fields['field_list']
+    ]
+
+    return fields
+
 
-        fields['field_name'] = field_info['field_name']
-        fields['field_str_id'] = field_info['field_str_id']
+def field_context(field_list):
 
+    fields = {
+        'field_name': field_list.field_name,
+        'field_str_id': field_list.get_field_str_id(),
+        'field_list': [],
+    }
+
+    for field in field_list.get_list():
         fields['field_list'].append({
-            'value' : field_info['value'],
-            'object_id': field_info['object_id'],
-            'field_id': field_info['field_id'],
-            'path': path,
+            'value' : field_value(field),
+            'field_id': field.id_,
         })
     
     return fields
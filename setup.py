@@ -14,14 +14,16 @@ setup(
     author = "Guillaume Auger",
     author_email = "gauger@caravan.coop",
     url = "https://github.com/caravancoop/complex-fields",
-    packages = find_packages(),
+    packages = find_packages(exclude=['tests', 'tests.*']),
     package_data = {
         "complex_fields": ["templates/*.html"]
     },
     zip_safe=False,
+    python_requires=">=3.6",
     install_requires=[
-        "Django>=1.8.3<2.0",
-        "django-reversion==2.0.4",
+        "Django>=3.0,<4.0",
+        "asgiref>=3.2",
+        "django-reversion>=3.0.5",
         "django-languages-plus==0.1.5",
     ],
     classifiers = [
@@ -30,7 +32,11 @@ setup(
         "Intended Audience :: Developers",
         "Licence :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)",
         "Operating System :: OS Independent",
-        "Programming Language :: Python :: 3.4",
+        "Framework :: Django :: 3.0",
+        "Framework :: Django :: 3.1",
+        "Framework :: Django :: 3.2",
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.6",
         "Topic :: Database",
         "Topic :: Internet :: WWW/HTTP :: Dynamic Content",
         "Topic :: Text Processing :: Linguistic",
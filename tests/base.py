@@ -0,0 +1,37 @@
+import reversion
+from django.test import TestCase
+from reversion.models import Version
+
+from source.models import AccessPoint, Source
+
+from tests.models import Organization, OrganizationName
+
+
+class ComplexFieldsTestCase(TestCase):
+    def setUp(self):
+        self.source = Source.objects.create()
+        self.other_source = Source.objects.create()
+        self.accesspoint = AccessPoint.objects.create(source=self.source)
+        self.other_accesspoint = AccessPoint.objects.create(source=self.other_source)
+
+    def sources(self, *accesspoints, confidence='2'):
+        return {'sources': list(accesspoints), 'confidence': confidence}
+
+    def dict_values(self, name, *accesspoints, active=True):
+        return {
+            'Organization_OrganizationName': dict(self.sources(*accesspoints), value=name),
+            'Organization_OrganizationActive': {'value': active},
+        }
+
+    def create_organization(self, name='Organization', lang='en'):
+        with reversion.create_revision():
+            return Organization.create(self.dict_values(name, self.accesspoint), lang)
+
+    def get_name(self, organization, lang='en'):
+        return OrganizationName.objects.get(object_ref=organization, lang=lang)
+
+    def get_versions(self, row):
+        return list(Version.objects.get_for_object(row).order_by('pk'))
+
+    def get_accesspoint_ids(self, row):
+        return set(row.accesspoints.values_list('pk', flat=True))
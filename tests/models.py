@@ -0,0 +1,44 @@
+from django.db import models
+
+from complex_fields.base_models import BaseModel
+from complex_fields.model_decorators import sourced, translated, versioned
+from complex_fields.models import (ComplexField, ComplexFieldContainer,
+                                   ComplexFieldListContainer)
+
+
+class Organization(models.Model, BaseModel):
+    def __init__(self, *args, **kwargs):
+        self.name = ComplexFieldContainer(self, OrganizationName)
+        self.active = ComplexFieldContainer(self, OrganizationActive)
+        self.aliases = ComplexFieldListContainer(self, OrganizationAlias)
+
+        self.complex_fields = [self.name, self.active]
+        self.complex_lists = [self.aliases]
+        self.required_fields = ['Organization_OrganizationName']
+
+        super().__init__(*args, **kwargs)
+
+
+@translated
+@versioned
+@sourced
+class OrganizationName(ComplexField):
+    object_ref = models.ForeignKey(Organization, on_delete=models.CASCADE)
+    value = models.TextField(default=None, blank=True, null=True)
+    field_name = 'Name'
+
+
+@versioned
+class OrganizationActive(ComplexField):
+    object_ref = models.ForeignKey(Organization, on_delete=models.CASCADE)
+    value = models.BooleanField(default=False)
+    field_name = 'Active'
+
+
+@versioned
+@sourced
+class OrganizationAlias(ComplexField):
+    object_ref = models.ForeignKey(Organization, on_delete=models.CASCADE)
+    value = models.TextField(default=None, blank=True, null=True)
+    note = models.CharField(max_length=255, blank=True, default='')
+    field_name = 'Alias'
@@ -0,0 +1,35 @@
+# Settings of the test suite, run with runtests.py. Like the package, the
+# tests need the source and sfm_pc apps of the host project on the path.
+
+SECRET_KEY = 'complex-fields-tests'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'countries_plus',
+    'languages_plus',
+    'reversion',
+    'source',
+    'complex_fields',
+    'tests',
+]
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+LANGUAGE_CODE = 'en'
+USE_I18N = True
+USE_TZ = True
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'APP_DIRS': True,
+    }
+]
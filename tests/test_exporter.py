@@ -0,0 +1,21 @@
+from unittest import mock
+
+from complex_fields.exporter import Exporter
+
+from tests.base import ComplexFieldsTestCase
+from tests.models import Organization
+
+
+class ExporterTest(ComplexFieldsTestCase):
+    def test_batches_access_point_ids(self):
+        organizations = [self.create_organization('Organization %d' % index)
+                         for index in range(3)]
+
+        with mock.patch('complex_fields.exporter.PREFETCH_BATCH_SIZE', 2):
+            records = list(Exporter(Organization).run())
+
+        self.assertEqual([record['id'] for record in records],
+                         [str(organization.pk) for organization in organizations])
+        for record in records:
+            name, = record['fields']['Organization_OrganizationName']
+            self.assertEqual(name['sources'], [str(self.accesspoint.pk)])
@@ -0,0 +1,66 @@
+import reversion
+
+from tests.base import ComplexFieldsTestCase
+from tests.models import OrganizationAlias
+
+
+class UpdateListTest(ComplexFieldsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organization = self.create_organization()
+        self.other = self.create_organization('Other')
+
+        self.first, self.second = [
+            OrganizationAlias.objects.create(object_ref=self.organization, lang='en', value=value)
+            for value in ['First', 'Second']
+        ]
+        self.copied = OrganizationAlias.objects.create(object_ref=self.other, lang='en',
+                                                       value='Copied')
+
+    def update_list(self, values, *accesspoints):
+        dict_values = {
+            'Organization_OrganizationAlias': dict(self.sources(*accesspoints), values=values),
+        }
+        self.organization.update_list(self.organization.aliases, dict_values, 'en')
+
+    def get_aliases(self):
+        return list(OrganizationAlias.objects.filter(object_ref=self.organization).order_by('pk'))
+
+    def test_keeps_deletes_and_copies_rows(self):
+        self.update_list([self.first, self.copied], self.accesspoint)
+
+        first, copied = self.get_aliases()
+        self.assertEqual(first.pk, self.first.pk)
+        self.assertEqual(copied.value, 'Copied')
+        self.assertNotEqual(copied.pk, self.copied.pk)
+        self.assertTrue(OrganizationAlias.objects.filter(pk=self.copied.pk).exists())
+        self.assertEqual(self.get_accesspoint_ids(copied), {self.accesspoint.pk})
+
+    def test_rejects_unsaved_values(self):
+        unsaved = OrganizationAlias(object_ref=self.organization, lang='en', value='Unsaved')
+        with self.assertRaises(ValueError):
+            self.update_list([self.first, unsaved], self.accesspoint)
+
+    def test_saves_changes_to_other_columns(self):
+        self.first.note = 'Edited'
+        self.update_list([self.first], self.accesspoint)
+
+        self.assertEqual(OrganizationAlias.objects.get(pk=self.first.pk).note, 'Edited')
+
+    def test_versions_hold_sources(self):
+        with reversion.create_revision():
+            self.update_list([self.first, self.copied], self.other_accesspoint)
+
+        for alias in self.get_aliases():
+            version = self.get_versions(alias)[-1]
+            self.assertEqual(version.field_dict['accesspoints'], [self.other_accesspoint.pk])
+            self.assertIn(self.other_source.pk, version.field_dict['sources'])
+
+
+class ComplexFieldListTest(ComplexFieldsTestCase):
+    def test_negative_index(self):
+        organization = self.create_organization()
+        for value in ['First', 'Second']:
+            OrganizationAlias.objects.create(object_ref=organization, lang='en', value=value)
+
+        self.assertEqual(organization.aliases.get_list()[-1].get_value().value, 'Second')
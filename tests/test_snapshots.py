@@ -0,0 +1,28 @@
+from django.test import override_settings
+
+from complex_fields.snapshots import rebuild_snapshots
+
+from tests.base import ComplexFieldsTestCase
+from tests.models import Organization
+
+
+@override_settings(COMPLEX_FIELDS_SNAPSHOTS=True, COMPLEX_FIELDS_SNAPSHOT_LANGUAGES=['en'])
+class SnapshotTest(ComplexFieldsTestCase):
+    def setUp(self):
+        super().setUp()
+        organization = self.create_organization()
+        rebuild_snapshots(Organization, [organization.pk])
+        self.organization = Organization.objects.get(pk=organization.pk)
+
+    def test_reads_use_snapshot(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.organization.name.get_value('en').value, 'Organization')
+
+    def test_writes_ignore_snapshot(self):
+        # The snapshot is only rebuilt on commit, it still holds the name
+        # and the confidence of before the update.
+        sources = self.sources(self.accesspoint, confidence='3')
+        self.organization.name.update('Renamed', 'en', sources)
+
+        self.assertFalse(self.organization.name.update_translations('Renamed', 'en', sources))
+        self.assertEqual(self.organization.name.get_value('en').value, 'Renamed')
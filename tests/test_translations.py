@@ -0,0 +1,50 @@
+import reversion
+
+from complex_fields.models import complex_fields_bulk_updated
+
+from tests.base import ComplexFieldsTestCase
+
+
+class TranslationTest(ComplexFieldsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organization = self.create_organization()
+
+        with reversion.create_revision():
+            self.organization.name.translate('Organisation', 'fr')
+
+    def test_translate_versions_hold_copied_sources(self):
+        translation = self.get_name(self.organization, 'fr')
+        self.assertEqual(translation.value, 'Organisation')
+        self.assertEqual(self.get_accesspoint_ids(translation), {self.accesspoint.pk})
+
+        version, = self.get_versions(translation)
+        self.assertEqual(version.field_dict['accesspoints'], [self.accesspoint.pk])
+
+    def test_update_translations_clears_changed_translations(self):
+        object_ids = []
+
+        def receiver(sender, **kwargs):
+            object_ids.extend(kwargs['object_ids'])
+
+        complex_fields_bulk_updated.connect(receiver)
+        try:
+            self.organization.name.update_translations('Renamed', 'en',
+                                                       self.sources(self.accesspoint))
+        finally:
+            complex_fields_bulk_updated.disconnect(receiver)
+
+        self.assertIsNone(self.get_name(self.organization, 'fr').value)
+        self.assertEqual(object_ids, [self.organization.pk])
+
+    def test_update_translations_versions_hold_sources(self):
+        with reversion.create_revision():
+            self.organization.name.update_translations('Renamed', 'en',
+                                                       self.sources(self.other_accesspoint))
+
+        translation = self.get_name(self.organization, 'fr')
+        self.assertEqual(self.get_accesspoint_ids(translation), {self.other_accesspoint.pk})
+
+        version = self.get_versions(translation)[-1]
+        self.assertIsNone(version.field_dict['value'])
+        self.assertEqual(version.field_dict['accesspoints'], [self.other_accesspoint.pk])
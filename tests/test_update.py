@@ -0,0 +1,76 @@
+import reversion
+from django.test import override_settings
+
+from tests.base import ComplexFieldsTestCase
+from tests.models import Organization, OrganizationActive, OrganizationName
+
+
+class UpdateTest(ComplexFieldsTestCase):
+    def test_create_writes_values_and_sources(self):
+        organization = self.create_organization()
+
+        name = self.get_name(organization)
+        self.assertEqual(name.value, 'Organization')
+        self.assertEqual(name.confidence, '2')
+        self.assertEqual(self.get_accesspoint_ids(name), {self.accesspoint.pk})
+        self.assertEqual(set(name.sources.values_list('pk', flat=True)), {self.source.pk})
+        self.assertTrue(OrganizationActive.objects.get(object_ref=organization).value)
+
+    def test_create_versions_hold_sources(self):
+        organization = self.create_organization()
+
+        version, = self.get_versions(self.get_name(organization))
+        self.assertEqual(version.field_dict['accesspoints'], [self.accesspoint.pk])
+        self.assertEqual(version.field_dict['sources'], [self.source.pk])
+
+    def test_update_versions_hold_sources(self):
+        organization = self.create_organization()
+
+        with reversion.create_revision():
+            organization.update(self.dict_values('Organization', self.other_accesspoint), 'en')
+
+        name = self.get_name(organization)
+        self.assertEqual(self.get_accesspoint_ids(name), {self.other_accesspoint.pk})
+
+        version = self.get_versions(name)[-1]
+        self.assertEqual(version.field_dict['accesspoints'], [self.other_accesspoint.pk])
+        self.assertIn(self.other_source.pk, version.field_dict['sources'])
+
+    def test_unchanged_update_is_not_saved(self):
+        organization = self.create_organization()
+
+        with reversion.create_revision():
+            organization.update(self.dict_values('Organization', self.accesspoint), 'en')
+
+        self.assertEqual(len(self.get_versions(self.get_name(organization))), 1)
+
+    def test_changed_value_is_saved(self):
+        organization = self.create_organization()
+
+        with reversion.create_revision():
+            organization.update(self.dict_values('Renamed', self.accesspoint), 'en')
+
+        name = self.get_name(organization)
+        self.assertEqual(name.value, 'Renamed')
+        self.assertEqual(len(self.get_versions(name)), 2)
+
+    def test_update_ignores_stale_prefetched_rows(self):
+        organization = self.create_organization()
+        organization.prefetch_complex_fields()
+        OrganizationName.objects.filter(object_ref=organization).update(value='Renamed')
+
+        organization.name.update('Organization', 'en', self.sources(self.accesspoint))
+
+        self.assertEqual(self.get_name(organization).value, 'Organization')
+
+    def test_translated_update_ignores_fallback_languages(self):
+        with reversion.create_revision():
+            organization = Organization.create(
+                self.dict_values('Organisation', self.accesspoint), 'fr'
+            )
+
+        with override_settings(COMPLEX_FIELDS_FALLBACK_LANGUAGES=['en', 'fr']):
+            organization.name.update('Organización', 'es', self.sources(self.accesspoint))
+
+        self.assertEqual(self.get_name(organization, 'fr').value, 'Organisation')
+        self.assertEqual(self.get_name(organization, 'es').value, 'Organización')